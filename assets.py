@@ -0,0 +1,89 @@
+import hashlib
+import os
+import threading
+
+import pygame
+
+import memory
+
+# --- Sprite atlas ---
+# Animation frames are scaled once and packed into a single atlas image, one
+# row per animation. The packed atlas is saved under CACHE_DIR, keyed by a hash
+# of the source files and the target size, so later runs decode one PNG and
+# hand out frames as subsurfaces of it. Nothing is read until the first frame
+# is asked for.
+CACHE_DIR = os.path.join(".cache", "atlas")
+
+
+class SpriteAtlas:
+    def __init__(self, animations, frame_size, cache_dir=CACHE_DIR):
+        # animations: {name: [path, ...]} in the order frames should play
+        self.animations = {name: list(paths) for name, paths in animations.items()}
+        self.frame_size = tuple(frame_size)
+        self.cache_dir = cache_dir
+        self.texture = None
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._rows = {name: row for row, name in enumerate(self.animations)}
+        self.columns = max((len(paths) for paths in self.animations.values()), default=0)
+
+    def cache_key(self):
+        digest = hashlib.sha1()
+        digest.update(repr(self.frame_size).encode())
+        for name, paths in self.animations.items():
+            digest.update(name.encode())
+            for path in paths:
+                with open(path, "rb") as f:
+                    digest.update(hashlib.sha1(f.read()).digest())
+        return digest.hexdigest()
+
+    def cache_path(self):
+        return os.path.join(self.cache_dir, "%s.png" % self.cache_key())
+
+    def _pack(self):
+        width, height = self.frame_size
+        atlas = pygame.Surface((width * self.columns, height * len(self.animations)), pygame.SRCALPHA)
+        for name, paths in self.animations.items():
+            y = self._rows[name] * height
+            for column, path in enumerate(paths):
+                img = pygame.image.load(path).convert_alpha()
+                atlas.blit(pygame.transform.smoothscale(img, self.frame_size), (column * width, y))
+        return atlas
+
+    def load(self):
+        # Safe to call from a loader thread while the main thread asks for frames
+        if self.texture is not None:
+            return self.texture
+        with self._lock:
+            if self.texture is None:
+                path = self.cache_path()
+                if os.path.exists(path):
+                    texture = pygame.image.load(path).convert_alpha()
+                else:
+                    texture = self._pack()
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    tmp_path = path + ".tmp.png"
+                    pygame.image.save(texture, tmp_path)
+                    os.replace(tmp_path, path)
+                self.texture = memory.track("sprites", texture)
+        return self.texture
+
+    def frames(self, name):
+        frames = self._frames.get(name)
+        if frames is None:
+            texture = self.load()
+            width, height = self.frame_size
+            y = self._rows[name] * height
+            frames = [texture.subsurface((column * width, y, width, height))
+                      for column in range(len(self.animations[name]))]
+            self._frames[name] = frames
+        return frames
+
+    def __getitem__(self, name):
+        return self.frames(name)
+
+    def __contains__(self, name):
+        return name in self.animations
+
+    def keys(self):
+        return self.animations.keys()
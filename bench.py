@@ -0,0 +1,334 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Always headless; nothing is ever shown
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import pygame
+
+import assets
+import chunks
+import collision
+import entities
+import game
+import overlays
+import quality
+import render
+import scenery
+import startup
+import text
+import video
+from settings import WIDTH, HEIGHT, PLAYER_SIZE
+
+np = startup.lazy_import("numpy")
+
+# --- Benchmarks ---
+# Times the hot paths on their own, without starting the game:
+#
+#     python bench.py --save          # record a baseline for this machine
+#     python bench.py                 # compare against it
+#     python bench.py text video      # only the groups/cases matching these
+#
+# Each case is run in batches long enough to time reliably; the median time
+# per call is compared with the baseline and anything slower by more than
+# --threshold is reported as a regression (exit status 1). Baselines are
+# machine-specific, so they live under .cache/ rather than in the repo.
+BASELINE = os.path.join(".cache", "bench", "baseline.json")
+THRESHOLD = 0.15
+REPEAT = 7
+BATCH_SECONDS = 0.02
+
+GROUPS = []
+
+
+def group(fn):
+    # Registers a group: a generator of (case name, function to time) that
+    # does its setup before yielding
+    GROUPS.append((fn.__name__, fn))
+    return fn
+
+
+# --- Cases ---
+@group
+def draw(screen, world):
+    # The room is built once per visit; frames then blit all of it (a full
+    # redraw) or restore just what the player, shadow and prompt covered
+    yield "build_room", lambda: scenery.build_room(world.house_level)
+    room = scenery.build_room(world.house_level)
+    yield "room full redraw", lambda: screen.blit(room, (0, 0))
+    dirty = [pygame.Rect(600, 400, *PLAYER_SIZE), pygame.Rect(600, 435, PLAYER_SIZE[0], 12),
+             pygame.Rect(520, 360, 200, 34)]
+
+    def restore():
+        for rect in dirty:
+            screen.blit(room, rect, rect)
+    yield "room dirty restore", restore
+
+    entrance = world.pizza_building_entrance
+    strip = pygame.Surface((chunks.CHUNK_WIDTH, HEIGHT))
+    for camera_x in (0, 1300, 2600, 4400):
+        yield "render_street_chunk x=%d" % camera_x, lambda x=camera_x: scenery.render_street_chunk(strip, x, entrance)
+
+    for scale in (1.0, 0.5):
+        # Warm strips only (prefetch=0, so no worker thread)
+        street = chunks.ChunkCache(lambda surface, x: scenery.render_street_chunk(surface, x, entrance),
+                                   HEIGHT, prefetch=0)
+        street.set_scale(scale)
+        target = quality.render_target(screen, scale)
+        for camera_x in (0, 1300, 2600, 4400):
+            street.draw(target, camera_x)
+
+            def draw_city(x=camera_x, street=street, target=target):
+                street.draw(target, x)
+                quality.upscale(target, screen)
+            yield "draw_city x=%d scale=%s" % (camera_x, scale), draw_city
+
+    # A whole street frame at each quality level, as main.py draws it: the
+    # strips and traffic into the level's render target, scaled up, then
+    # the player on top. The governor only pays off if these go down.
+    cars = entities.Traffic([(470, 3.0), (535, -3.5)], HEIGHT // 2 + 4, min_x=-200, max_x=4450,
+                            blockers=world.street_level.rects("collision"), cars_per_lane=24, pedestrians=160)
+    player = pygame.Surface(PLAYER_SIZE).convert()
+    queue = render.RenderQueue()
+    for level in quality.LEVELS:
+        street = chunks.ChunkCache(lambda surface, x: scenery.render_street_chunk(surface, x, entrance),
+                                   HEIGHT, prefetch=0)
+        street.set_scale(level.scale)
+
+        def street_frame(level=level, street=street, camera_x=1300):
+            target = quality.render_target(screen, level.scale)
+            street.draw(target, camera_x)
+            cars.submit(queue, camera_x, WIDTH)
+            if level.shadows:
+                queue.sprite(overlays.ellipse((PLAYER_SIZE[0], 12), (0, 0, 0, 80)), (380, 340), screen_space=True)
+            queue.sprite(player, (380, 300), screen_space=True)
+            if target is not screen:
+                queue.flush(target, (camera_x, 0), level.scale, below=render.HUD)
+                quality.upscale(target, screen)
+            queue.flush(screen, (camera_x, 0))
+        yield "street_frame level=%s" % level.name, street_frame
+
+
+@group
+def collide(screen, world):
+    # Every rect the player rect overlaps, out of n random rects over the
+    # street: a full linear scan and the spatial grid game.step uses. (A
+    # scan stopping at the first hit is only slower than the grid when it
+    # misses, and with this many rects most queries hit something early.)
+    rng = random.Random(1)
+    queries = [pygame.Rect(rng.randrange(0, 5000), rng.randrange(0, HEIGHT), *PLAYER_SIZE) for _ in range(256)]
+    for count in (10, 100, 1000, 10000):
+        rects = [pygame.Rect(rng.randrange(0, 5000), rng.randrange(0, HEIGHT), rng.randrange(10, 120),
+                             rng.randrange(10, 120)) for _ in range(count)]
+        grid = collision.SpatialGrid(rects)
+
+        def linear(rects=rects, query=itertools.cycle(queries).__next__):
+            player_rect = query()
+            return [rect for rect in rects if player_rect.colliderect(rect)]
+        yield "linear all n=%d" % count, linear
+        yield "grid all n=%d" % count, lambda grid=grid, query=itertools.cycle(queries).__next__: grid.overlapping(query())
+
+
+@group
+def fonts(screen, world):
+    yield "SysFont(None, 24)", lambda: pygame.font.SysFont(None, 24)
+    yield "text.get_font (cached)", lambda: text.get_font(None, 24)
+    font = text.get_font(None, 32)
+    message = "What the... why are there so many pizza buildings?"
+    yield "font.render", lambda: font.render(message, True, (0, 0, 0))
+    yield "text.render (cached)", lambda: text.render(font, message, (0, 0, 0))
+    yield "text.render_sys (cached)", lambda: text.render_sys("Pizza", 24, (0, 0, 0))
+
+
+class _FrameSource:
+    # Stands in for a decoded clip at size
+    def __init__(self, size):
+        self.size = size
+        self.fps = 30
+
+
+@group
+def frames(screen, world):
+    size = (1280, 720)
+    frame = np.random.default_rng(1).integers(0, 255, (size[1], size[0], 3), dtype="uint8")
+
+    # What play_jumpscare used to do per frame
+    yield "swapaxes+make_surface+scale", lambda: screen.blit(
+        pygame.transform.scale(pygame.surfarray.make_surface(frame.swapaxes(0, 1)), (WIDTH, HEIGHT)), (0, 0))
+
+    player = video.VideoPlayer(_FrameSource(size), (WIDTH, HEIGHT))
+    player._decode_surface = pygame.Surface(size)
+    slot = pygame.Surface((WIDTH, HEIGHT))
+
+    def fill():
+        player._fill(slot, frame)
+        screen.blit(slot, (0, 0))
+    yield "VideoPlayer ring slot", fill
+
+    # A raw cache of a few blank frames at window size
+    cache_dir = tempfile.mkdtemp(prefix="bench-video-")
+    path = os.path.join(cache_dir, "frames.rgb")
+    with open(path, "wb") as f:
+        f.write(video.RAW_HEADER.pack(video.RAW_MAGIC, video.RAW_VERSION, 0, WIDTH, HEIGHT, 30.0, 8, 0, 0)
+                .ljust(video.RAW_DATA_OFFSET, b"\0"))
+        f.write(bytes(WIDTH * HEIGHT * 3 * 8))
+    source = video.RawFrameSource(path)
+    index = itertools.cycle(range(source.frame_count)).__next__
+    try:
+        yield "raw cache frame_at", lambda: screen.blit(source.frame_at(index()), (0, 0))
+    finally:
+        source.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+@group
+def sprites(screen, world):
+    animations = {
+        "up": [f"pokemon_forward_{i}.png" for i in range(1, 4)],
+        "down": [f"pokemon_backward_{i}.png" for i in range(1, 4)],
+        "left": [f"pokemon_left_{i}.png" for i in range(1, 4)],
+        "right": [f"pokemon_right_{i}.png" for i in range(1, 4)],
+    }
+    paths = [path for frames in animations.values() for path in frames]
+
+    # The original load_and_scale: decode and scale every frame
+    yield "load_and_scale", lambda: [pygame.transform.smoothscale(pygame.image.load(path).convert_alpha(), PLAYER_SIZE)
+                                     for path in paths]
+
+    cache_dir = tempfile.mkdtemp(prefix="bench-atlas-")
+    try:
+        def cold():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            return assets.SpriteAtlas(animations, PLAYER_SIZE, cache_dir).load()
+        yield "atlas (pack and save)", cold
+        yield "atlas (from cache)", lambda: assets.SpriteAtlas(animations, PLAYER_SIZE, cache_dir).load()
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+@group
+def traffic(screen, world):
+    street = world.street_level
+    cars = entities.Traffic([(470, 3.0), (535, -3.5)], HEIGHT // 2 + 4, min_x=-200, max_x=4450,
+                            blockers=street.rects("collision"), cars_per_lane=24, pedestrians=160,
+                            navigation=world.street_nav, goals=["pizza_building_entrance", "big_pizza_entrance"],
+                            customers=40)
+    yield "Traffic.step", lambda: cars.step(game.STEP_MS)
+
+    queue = render.RenderQueue()
+
+    def submit_and_flush():
+        cars.submit(queue, 1300, WIDTH)
+        queue.flush(screen, (1300, 0))
+    yield "Traffic.submit + flush", submit_and_flush
+
+
+# --- Running ---
+def measure(fn, repeat=REPEAT):
+    # Median and best seconds per call, over repeat batches
+    fn()
+    loops = 1
+    while True:
+        began = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - began
+        if elapsed >= BATCH_SECONDS:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(BATCH_SECONDS / elapsed) + 1))
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - began) / loops)
+    return {"median_us": round(statistics.median(samples) * 1e6, 3),
+            "min_us": round(min(samples) * 1e6, 3), "loops": loops}
+
+
+def run(patterns=(), repeat=REPEAT, out=sys.stdout):
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    world = game.load_world()
+    results = {}
+    for group_name, make_cases in GROUPS:
+        for case, fn in make_cases(screen, world):
+            name = "%s/%s" % (group_name, case)
+            if patterns and not any(pattern in name for pattern in patterns):
+                continue
+            results[name] = measure(fn, repeat)
+            print("  %-44s %12.1f us" % (name, results[name]["median_us"]), file=out)
+    pygame.quit()
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Returns the names of cases slower than baseline by more than threshold
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None or not before["median_us"]:
+            continue
+        change = result["median_us"] / before["median_us"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("  %-44s %10.1f -> %10.1f us  %+6.1f%%%s"
+              % (name, before["median_us"], result["median_us"], change * 100, flag))
+    return regressions
+
+
+def save(path, results):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    report = {
+        "meta": {"python": platform.python_version(), "pygame": pygame.version.ver,
+                 "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths")
+    parser.add_argument("patterns", nargs="*", help="only run cases whose group/name contains one of these")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare against or save to")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="slowdown that counts as a regression (0.15 = 15%%)")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed batches per case")
+    parser.add_argument("--output", metavar="PATH", help="also write this run's results to PATH")
+    args = parser.parse_args()
+
+    print("running benchmarks")
+    results = run(args.patterns, args.repeat)
+    if args.output:
+        save(args.output, results)
+    if args.save:
+        if args.patterns and os.path.exists(args.baseline):
+            # Only the cases that ran are replaced
+            with open(args.baseline) as f:
+                results = {**json.load(f)["results"], **results}
+        save(args.baseline, results)
+        print("baseline saved to %s" % args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print("against %s (threshold %.0f%%)" % (args.baseline, args.threshold * 100))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("%d regression(s)" % len(regressions))
+            sys.exit(1)
+    else:
+        print("no baseline at %s; run with --save to record one" % args.baseline)
@@ -0,0 +1,184 @@
+import math
+import queue
+import threading
+from collections import OrderedDict
+
+import pygame
+
+import memory
+
+# --- Street chunks ---
+# The street is cut into fixed-width world strips. Each strip is drawn once by
+# render_chunk(surface, world_x) into an off-screen surface and kept in an LRU
+# bounded by max_bytes. Drawing a frame is then just blitting the two or three
+# strips under the camera, and a worker thread renders the strips just ahead
+# of the camera in the direction it is moving. Evicted strips are kept as
+# spares and drawn over again, so a long walk stops allocating surfaces once
+# the cache is full.
+#
+# set_scale() stores the strips scaled down for a smaller render target (see
+# quality.py); they are still drawn at full size first, into one scratch
+# surface the cache keeps, then smoothscaled once. chunk_width * scale should
+# be a whole number of pixels.
+CHUNK_WIDTH = 600
+MAX_BYTES = 16 * 1024 * 1024
+PREFETCH = 2
+
+
+class ChunkCache:
+    def __init__(self, render_chunk, height, chunk_width=CHUNK_WIDTH, max_bytes=MAX_BYTES, prefetch=PREFETCH):
+        self.render_chunk = render_chunk
+        self.height = height
+        self.chunk_width = chunk_width
+        self.max_bytes = max_bytes
+        self.prefetch_count = prefetch
+        self.scale = 1.0
+
+        self.chunks = OrderedDict()
+        self._spares = []
+        self.bytes = 0
+        self.visible = ()
+        self.stats = {"hits": 0, "misses": 0, "prefetched": 0, "evictions": 0}
+        self._last_camera_x = None
+        self._direction = 1
+
+        self._lock = threading.Lock()
+        self._scratch = None  # full-size strip drawn into before scaling
+        self._scratch_lock = threading.Lock()  # the worker and get() both render
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def _size(self, scale):
+        return round(self.chunk_width * scale), round(self.height * scale)
+
+    def _render(self, index):
+        with self._lock:
+            scale = self.scale
+            surface = self._spares.pop() if self._spares else None
+        if surface is None:
+            surface = memory.track("street_chunks", pygame.Surface(self._size(scale)))
+        if scale == 1.0:
+            self.render_chunk(surface, index * self.chunk_width)
+            return surface
+        with self._scratch_lock:
+            if self._scratch is None:
+                self._scratch = memory.track("street_chunks", pygame.Surface((self.chunk_width, self.height)))
+            self.render_chunk(self._scratch, index * self.chunk_width)
+            pygame.transform.smoothscale(self._scratch, surface.get_size(), surface)
+        return surface
+
+    def _store(self, index, surface):
+        # Caller holds the lock
+        if surface.get_size() != self._size(self.scale):
+            # Rendered before a scale change; keep the newer strip if any
+            return self.chunks.get(index) or surface
+        if index in self.chunks:
+            return self.chunks[index]
+        self.chunks[index] = surface
+        self.bytes += surface.get_width() * surface.get_height() * surface.get_bytesize()
+        self._evict()
+        return surface
+
+    def _evict(self):
+        for index in list(self.chunks):
+            if self.bytes <= self.max_bytes:
+                break
+            if index in self.visible:
+                continue
+            surface = self.chunks.pop(index)
+            self.bytes -= surface.get_width() * surface.get_height() * surface.get_bytesize()
+            self.stats["evictions"] += 1
+            # Never on screen (see visible above), so safe to draw over
+            if len(self._spares) <= self.prefetch_count:
+                self._spares.append(surface)
+
+    def get(self, index):
+        with self._lock:
+            surface = self.chunks.get(index)
+            if surface is not None:
+                self.chunks.move_to_end(index)
+                self.stats["hits"] += 1
+                return surface
+            self.stats["misses"] += 1
+
+        # Not ready yet (or never asked for): render it right here
+        surface = self._render(index)
+        with self._lock:
+            return self._store(index, surface)
+
+    def draw(self, screen, camera_x, y=0):
+        scale = self.scale
+        width = screen.get_width() / scale
+        first = math.floor(camera_x / self.chunk_width)
+        last = math.floor((camera_x + width - 1) / self.chunk_width)
+        self.visible = range(first, last + 1)
+
+        if self._last_camera_x is not None and camera_x != self._last_camera_x:
+            self._direction = 1 if camera_x > self._last_camera_x else -1
+        self._last_camera_x = camera_x
+
+        for index in self.visible:
+            x = math.floor((index * self.chunk_width - camera_x) * scale)
+            screen.blit(self.get(index), (x, y))
+
+        if self._direction > 0:
+            ahead = range(last + 1, last + 1 + self.prefetch_count)
+        else:
+            ahead = range(first - 1, first - 1 - self.prefetch_count, -1)
+        for index in ahead:
+            self.prefetch(index)
+
+    # --- Background generation ---
+    def prefetch(self, index):
+        with self._lock:
+            if index in self.chunks or index in self._pending:
+                return
+            self._pending.add(index)
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, name="street-chunks", daemon=True)
+            self._worker.start()
+        self._queue.put(index)
+
+    def _work(self):
+        while True:
+            index = self._queue.get()
+            if index is None:
+                break
+            surface = self._render(index)
+            with self._lock:
+                self._pending.discard(index)
+                if index not in self.chunks:
+                    self._store(index, surface)
+                    self.stats["prefetched"] += 1
+
+    def invalidate(self):
+        # Drop every cached strip, e.g. after the street layout changes
+        with self._lock:
+            self.chunks.clear()
+            self._spares.clear()
+            self.bytes = 0
+
+    def set_scale(self, scale):
+        # Strips are redrawn at the new scale as they're needed
+        with self._lock:
+            if scale == self.scale:
+                return
+            self.scale = scale
+            self.chunks.clear()
+            self._spares.clear()
+            self.bytes = 0
+        if scale == 1.0:
+            with self._scratch_lock:
+                self._scratch = None
+
+    def stop(self):
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def cache_info(self):
+        with self._lock:
+            return {"chunks": len(self.chunks), "spares": len(self._spares), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "scale": self.scale, **self.stats}
@@ -0,0 +1,84 @@
+import pygame
+
+# --- Spatial grid ---
+# Uniform grid over static scene geometry. Each rect is registered in every
+# cell it touches, so a query only looks at the handful of rects sharing a
+# cell with it instead of scanning the whole scene. Build one per scene.
+CELL_SIZE = 64
+
+
+class SpatialGrid:
+    def __init__(self, rects=(), cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.rects = []
+        self.cells = {}
+        for rect in rects:
+            self.add(rect)
+
+    def __len__(self):
+        return len(self.rects)
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        x0 = rect.left // size
+        y0 = rect.top // size
+        x1 = (rect.right - 1) // size
+        y1 = (rect.bottom - 1) // size
+        return x0, y0, max(x0, x1), max(y0, y1)
+
+    def add(self, rect):
+        rect = pygame.Rect(rect)
+        index = len(self.rects)
+        self.rects.append(rect)
+        x0, y0, x1, y1 = self._cell_range(rect)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.cells.setdefault((cx, cy), []).append(index)
+        return index
+
+    def candidates(self, rect):
+        # Indices of rects sharing at least one cell with rect (may not overlap)
+        found = set()
+        cells = self.cells
+        x0, y0, x1, y1 = self._cell_range(rect)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return sorted(found)
+
+    def overlapping(self, rect):
+        rects = self.rects
+        return [rects[i] for i in self.candidates(rect) if rect.colliderect(rects[i])]
+
+    def first_overlap(self, rect):
+        rects = self.rects
+        for i in self.candidates(rect):
+            if rect.colliderect(rects[i]):
+                return rects[i]
+        return None
+
+    def near(self, rect, distance=10):
+        # Same test the old is_near() did: overlap with the other rect grown
+        # by distance. With distance <= 0 this is a plain overlap check.
+        if distance <= 0:
+            return self.overlapping(rect)
+        rects = self.rects
+        search = rect.inflate(distance + 2, distance + 2)
+        return [rects[i] for i in self.candidates(search)
+                if rect.colliderect(rects[i].inflate(distance, distance))]
+
+    def query_many(self, rects):
+        # Batch query for moving rects. Returns, for each input rect, the
+        # indices into self.rects that it overlaps.
+        results = []
+        own = self.rects
+        for rect in rects:
+            found = self.candidates(rect)
+            if found:
+                hits = rect.collidelistall([own[i] for i in found])
+                results.append([found[h] for h in hits])
+            else:
+                results.append([])
+        return results
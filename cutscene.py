@@ -0,0 +1,289 @@
+import pygame
+
+import profiler
+import text
+
+# --- Cutscenes ---
+# A cutscene is a timeline: a list of steps played one after another on the
+# time the input source reports (so replays match the recording).
+#
+#     [Pause(1500, BLACK), Fade(BLACK, GREY, 1400),
+#      Typewriter("Hello.", (50, 300)), Prompt("Press Any Key", (50, 340)),
+#      Fade(GREY, BLACK, 1400)]
+#
+# Steps draw straight onto the screen and only mark what they changed, so a
+# frame where nothing moves presents nothing. Each line of text is rendered
+# once and revealed by blitting slices of it; fades are a precomputed table
+# of fill colors (the background is always a solid color).
+#
+# A key press completes the line being typed, or moves past a prompt.
+# Holding interact runs time FAST_FORWARD times faster; skip jumps to the end.
+#
+# Steps also say how long the screen will stay as it is (quiet_ms), so with a
+# pacer (see pacing.py) a pause or a prompt waiting on a key sleeps until the
+# next blink or keypress instead of redrawing nothing 60 times a second.
+FADE_LEVELS = 64
+FAST_FORWARD = 4
+
+
+class Step:
+    # update() returns None while the step is running, or the ms it did not
+    # use once it finishes (handed on to the next step)
+    def start(self, scene):
+        self.elapsed = 0
+
+    def update(self, scene, ms):
+        return 0
+
+    def press(self, scene):
+        # True if the press was used
+        return False
+
+    def finish(self, scene):
+        # Draw the state the step ends in, without waiting for it
+        pass
+
+    def quiet_ms(self, scene):
+        # How long until the step next changes the screen: 0 if it is
+        # changing now, None if only a key press will change it
+        return 0
+
+
+class Pause(Step):
+    def __init__(self, ms, color=None):
+        self.ms = ms
+        self.color = color
+
+    def start(self, scene):
+        super().start(scene)
+        if self.color is not None:
+            scene.fill(self.color)
+
+    def update(self, scene, ms):
+        self.elapsed += ms
+        if self.elapsed < self.ms:
+            return None
+        return self.elapsed - self.ms
+
+    def quiet_ms(self, scene):
+        return max(0, self.ms - self.elapsed)
+
+
+class Fade(Step):
+    def __init__(self, from_color, to_color, ms, levels=FADE_LEVELS):
+        self.ms = ms
+        last = levels - 1
+        self.colors = [tuple(round(a + (b - a) * i / last) for a, b in zip(from_color, to_color))
+                       for i in range(levels)]
+
+    def start(self, scene):
+        super().start(scene)
+        self.level = 0
+        scene.fill(self.colors[0])
+
+    def update(self, scene, ms):
+        self.elapsed += ms
+        level = min(len(self.colors) - 1, int(self.elapsed * (len(self.colors) - 1) / self.ms))
+        if level != self.level:
+            self.level = level
+            scene.fill(self.colors[level])
+        if self.elapsed < self.ms:
+            return None
+        return self.elapsed - self.ms
+
+    def finish(self, scene):
+        scene.fill(self.colors[-1])
+
+
+class Typewriter(Step):
+    def __init__(self, line, pos, char_ms=50, color=(255, 255, 255)):
+        self.line = line
+        self.pos = pos
+        self.char_ms = char_ms
+        self.color = color
+        self._layout = None
+
+    def layout(self, font):
+        # The rendered line and the x where each character starts, worked out
+        # once per font
+        if self._layout is None or self._layout[0] is not font:
+            surface = text.render(font, self.line, self.color)
+            edges = [font.size(self.line[:i])[0] for i in range(len(self.line) + 1)]
+            edges[-1] = surface.get_width()
+            self._layout = (font, surface, edges)
+        return self._layout
+
+    def start(self, scene):
+        super().start(scene)
+        scene.clear_text()
+        self.shown = 0
+
+    def reveal(self, scene, count):
+        _font, surface, edges = self.layout(scene.font)
+        if count > self.shown:
+            left, right = edges[self.shown], edges[count]
+            area = pygame.Rect(left, 0, max(0, right - left), surface.get_height())
+            scene.draw_text(surface, (self.pos[0] + left, self.pos[1]), area)
+            self.shown = count
+
+    def update(self, scene, ms):
+        self.elapsed += ms
+        total = len(self.line)
+        self.reveal(scene, min(total, int(self.elapsed // self.char_ms)))
+        if self.shown < total:
+            return None
+        return max(0, self.elapsed - total * self.char_ms)
+
+    def press(self, scene):
+        self.finish(scene)
+        self.elapsed = len(self.line) * self.char_ms
+        return True
+
+    def quiet_ms(self, scene):
+        return self.char_ms - self.elapsed % self.char_ms
+
+    def finish(self, scene):
+        self.reveal(scene, len(self.line))
+
+
+class Prompt(Step):
+    # Waits for a key press; after delay_ms the prompt blinks on and off
+    def __init__(self, label, pos, delay_ms=1000, blink_ms=800, color=(255, 255, 255)):
+        self.label = label
+        self.pos = pos
+        self.delay_ms = delay_ms
+        self.blink_ms = blink_ms
+        self.color = color
+
+    def start(self, scene):
+        super().start(scene)
+        self.visible = False
+        self.done = False
+
+    def update(self, scene, ms):
+        self.elapsed += ms
+        if self.done:
+            return 0
+        visible = self.elapsed >= self.delay_ms and (scene.time // self.blink_ms) % 2 == 0
+        if visible != self.visible:
+            self.visible = visible
+            surface = text.render(scene.font, self.label, self.color)
+            if visible:
+                scene.draw_text(surface, self.pos)
+            else:
+                scene.fill_rect(surface.get_rect(topleft=self.pos))
+        return None
+
+    def press(self, scene):
+        self.done = True
+        return True
+
+    def quiet_ms(self, scene):
+        if self.done:
+            return 0
+        if self.elapsed < self.delay_ms:
+            return self.delay_ms - self.elapsed
+        return self.blink_ms - scene.time % self.blink_ms
+
+
+class Cutscene:
+    def __init__(self, timeline, font, color=(0, 0, 0)):
+        self.timeline = list(timeline)
+        self.font = font
+        self.start_color = color
+
+    # --- Drawing (used by steps) ---
+    def fill(self, color):
+        self.color = color
+        self.screen.fill(color)
+        self.text_rects = []
+        self.full = True
+
+    def fill_rect(self, rect):
+        self.dirty.append(self.screen.fill(self.color, rect))
+
+    def draw_text(self, surface, pos, area=None):
+        rect = self.screen.blit(surface, pos, area)
+        self.text_rects.append(rect)
+        self.dirty.append(rect)
+
+    def clear_text(self):
+        for rect in self.text_rects:
+            self.fill_rect(rect)
+        self.text_rects = []
+
+    # --- Playback ---
+    def _advance(self, ms):
+        while self.index < len(self.timeline):
+            left = self.timeline[self.index].update(self, ms)
+            if left is None:
+                return
+            self.index += 1
+            if self.index < len(self.timeline):
+                self.timeline[self.index].start(self)
+            ms = left
+
+    def skip(self):
+        while self.index < len(self.timeline):
+            self.timeline[self.index].finish(self)
+            self.index += 1
+            if self.index < len(self.timeline):
+                self.timeline[self.index].start(self)
+
+    def run(self, screen, source, present, fps=60, pacer=None):
+        # present(rects=None) as in main.py. Returns False if the window was
+        # closed (the source is left open for the caller).
+        self.screen = screen
+        self.time = 0
+        self.index = 0
+        self.dirty = []
+        self.text_rects = []
+        self.fill(self.start_color)
+        if self.timeline:
+            self.timeline[0].start(self)
+        present()
+        self.full = False
+
+        key_released = True
+        skip_held = False
+        overlay_rect = None
+        while self.index < len(self.timeline):
+            frame = source.next_frame(fps, pacer.wait_ms if pacer else None)
+            profiler.frame()
+            if frame.quit:
+                return False
+            if pygame.K_F3 in frame.keydowns:
+                profiler.toggle_overlay()
+
+            with profiler.section("cutscene_draw"):
+                if overlay_rect is not None:
+                    self.fill_rect(overlay_rect)
+                ms = frame.ms * (FAST_FORWARD if frame.keys.interact else 1)
+                self.time += ms
+                if frame.keys.skip and not skip_held:
+                    self.skip()
+                elif frame.pressed and key_released:
+                    key_released = False
+                    self.timeline[self.index].press(self)
+                skip_held = frame.keys.skip
+                if frame.released:
+                    key_released = True
+                self._advance(ms)
+
+            overlay_rect = profiler.draw_overlay(screen)
+            if overlay_rect is not None:
+                self.dirty.append(overlay_rect)
+
+            with profiler.section("present"):
+                if self.full:
+                    present()
+                elif self.dirty:
+                    present(self.dirty)
+            self.full = False
+            self.dirty = []
+
+            if pacer is not None:
+                # Fast-forwarding and the profiler overlay keep it at full rate
+                busy = frame.keys.interact or profiler.overlay_visible or self.index >= len(self.timeline)
+                pacer.update(0 if busy else self.timeline[self.index].quiet_ms(self))
+        return True
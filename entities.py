@@ -0,0 +1,282 @@
+import pygame
+
+import memory
+import startup
+
+np = startup.lazy_import("numpy")
+
+# --- Entities ---
+# Street traffic is kept as a struct of arrays: one NumPy column per field,
+# one row per car or pedestrian, so updates run as whole-array operations
+# instead of a Python loop over objects. Only the rows near the camera are
+# ever touched from Python (to draw them).
+CAR = 0
+PEDESTRIAN = 1
+
+COLUMNS = {
+    "x": "float32", "y": "float32", "vx": "float32", "vy": "float32", "prev_x": "float32", "prev_y": "float32",
+    "w": "int16", "h": "int16", "lane": "int16", "goal": "int8", "kind": "uint8", "color": "uint8",
+    "anim_ms": "float32", "anim_frame": "uint8", "stuck": "uint16",
+}
+
+
+class EntityStore:
+    def __init__(self, capacity=256):
+        self.count = 0
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype) for name, dtype in COLUMNS.items()}
+        memory.track("entities", self, lambda store: sum(column.nbytes for column in store.columns.values()))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        # The live rows of a column (a view, so writes go through)
+        return self.columns[name][:self.count]
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, column.dtype)
+            grown[:self.count] = column[:self.count]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+    def add(self, n, **values):
+        # Appends n rows; values are scalars or length-n arrays per column
+        if self.count + n > self.capacity:
+            self._grow(self.count + n)
+        rows = slice(self.count, self.count + n)
+        for name, value in values.items():
+            self.columns[name][rows] = value
+        self.count += n
+        return rows
+
+    def remove(self, mask):
+        # Drops the rows where mask is True, keeping the rest in order
+        keep = ~np.asarray(mask)
+        kept = int(keep.sum())
+        for name, column in self.columns.items():
+            column[:kept] = column[:self.count][keep]
+        self.count = kept
+
+
+def overlapping(x, y, w, h, rects):
+    # For each entity, whether it overlaps any of rects ((M, 4) x, y, w, h)
+    if len(rects) == 0 or len(x) == 0:
+        return np.zeros(len(x), bool)
+    rx, ry, rw, rh = (rects[:, i][None, :] for i in range(4))
+    x, y, w, h = x[:, None], y[:, None], w[:, None], h[:, None]
+    hits = (x < rx + rw) & (x + w > rx) & (y < ry + rh) & (y + h > ry)
+    return hits.any(axis=1)
+
+
+# --- Traffic ---
+# Cars drive in lanes on the road and slow down behind the car ahead;
+# pedestrians walk the strip of sidewalk under the buildings and turn around
+# when they walk into one. Everything wraps around between min_x and max_x.
+# Some pedestrians are customers: they follow a flow field (navigation.py)
+# to one of the goals, disappear inside and turn up elsewhere on the street.
+# A customer whose move is undone STUCK_STEPS steps running has wedged itself
+# somewhere the field can't get it out of, and turns up elsewhere too.
+CAR_SIZE = (60, 26)
+PEDESTRIAN_SIZE = (12, 26)
+MIN_GAP = 12
+BRAKING = 0.2
+PEDESTRIAN_ANIMATION_MS = 200
+STUCK_STEPS = 60
+
+CAR_COLORS = [(200, 40, 40), (240, 200, 40), (40, 90, 200), (230, 230, 230), (30, 30, 30), (60, 160, 80)]
+PEDESTRIAN_COLORS = [(90, 60, 140), (200, 120, 60), (40, 120, 160), (160, 40, 90), (80, 80, 80)]
+
+
+class Traffic:
+    def __init__(self, lanes, sidewalk_y, min_x, max_x, blockers=(), cars_per_lane=20, pedestrians=100,
+                 navigation=None, goals=(), customers=0, seed=0):
+        # lanes: [(y, speed), ...]; a negative speed drives right to left.
+        # Speeds are pixels per simulation step, like PLAYER_SPEED.
+        # navigation is a navigation.FlowFields and goals names in it.
+        self.lanes = list(lanes)
+        self.sidewalk_y = sidewalk_y
+        self.navigation = navigation
+        self.goals = list(goals) if navigation is not None else []
+        self.rng = np.random.default_rng(seed)
+        self.min_x = min_x
+        self.max_x = max_x
+        self.blockers = np.array([tuple(rect) for rect in blockers], dtype="float32").reshape(-1, 4)
+        self.store = EntityStore(len(self.lanes) * cars_per_lane + pedestrians)
+        self.cruise = np.zeros(0, "float32")
+        rng = self.rng
+        span = max_x - min_x
+
+        for lane, (y, speed) in enumerate(self.lanes):
+            # Evenly spaced with a little jitter, each at its own cruise speed
+            x = min_x + (np.arange(cars_per_lane) + rng.uniform(0, 0.5, cars_per_lane)) * span / cars_per_lane
+            self.store.add(cars_per_lane, x=x, prev_x=x, y=y, vx=speed * rng.uniform(0.8, 1.2, cars_per_lane),
+                           prev_y=y, goal=-1, w=CAR_SIZE[0], h=CAR_SIZE[1], lane=lane, kind=CAR,
+                           color=rng.integers(0, len(CAR_COLORS), cars_per_lane))
+
+        x = rng.uniform(min_x, max_x, pedestrians)
+        y = sidewalk_y + rng.uniform(0, 20, pedestrians)
+        self.store.add(pedestrians, x=x, prev_x=x, y=y, prev_y=y, goal=-1,
+                       vx=rng.choice([-1.0, 1.0], pedestrians) * rng.uniform(0.4, 1.1, pedestrians),
+                       w=PEDESTRIAN_SIZE[0], h=PEDESTRIAN_SIZE[1], lane=-1, kind=PEDESTRIAN,
+                       color=rng.integers(0, len(PEDESTRIAN_COLORS), pedestrians),
+                       anim_ms=rng.uniform(0, PEDESTRIAN_ANIMATION_MS, pedestrians))
+        # Nobody starts inside a building
+        s = self.store
+        walkers = s["kind"] == PEDESTRIAN
+        inside = np.zeros(len(s), bool)
+        inside[walkers] = overlapping(s["x"][walkers], s["y"][walkers], s["w"][walkers], s["h"][walkers], self.blockers)
+        s.remove(inside)
+        self.cruise = s["vx"].copy()
+
+        if self.goals and customers:
+            walkers = np.flatnonzero(s["kind"] == PEDESTRIAN)[:customers]
+            s["goal"][walkers] = rng.integers(0, len(self.goals), len(walkers))
+
+    def _follow(self, cars):
+        # Each car's speed this step: its cruise speed, capped by the room to
+        # the car ahead in its lane. Moving at most BRAKING of the spare room
+        # per step means a car never reaches the one in front of it.
+        s = self.store
+        lane = s["lane"][cars]
+        width = s["w"][cars]
+        cruise = self.cruise[cars]
+        direction = np.sign(cruise)
+        along = s["x"][cars] * direction  # distance along the direction of travel
+        order = np.lexsort((along, lane))
+        n = len(order)
+
+        # The car ahead is the next one in the same lane; the front car of a
+        # lane follows the back one around the wrap
+        lanes = lane[order]
+        following = np.arange(1, n + 1)
+        front = (following == n) | (lanes[np.minimum(following, n - 1)] != lanes)
+        following[front] = np.searchsorted(lanes, lanes[front], side="left")
+        ahead = order[following]
+        gap = along[ahead] - along[order] - width[order] + np.where(front, self.max_x - self.min_x, 0)
+
+        speed = np.empty(n, "float32")
+        speed[order] = np.minimum(np.abs(cruise[order]), np.maximum(0, (gap - MIN_GAP) * BRAKING))
+        return speed * direction
+
+    def step(self, step_ms):
+        s = self.store
+        x, y, vx, vy = s["x"], s["y"], s["vx"], s["vy"]
+        s["prev_x"][:] = x
+        s["prev_y"][:] = y
+        cars = s["kind"] == CAR
+        vx[cars] = self._follow(cars)
+        self._steer_customers()
+        x += vx
+        y += vy
+
+        # Pedestrians that walked into a building step back and turn around
+        walkers = ~cars
+        hit = np.zeros(len(s), bool)
+        hit[walkers] = overlapping(x[walkers], s["y"][walkers], s["w"][walkers], s["h"][walkers], self.blockers)
+        x[hit] = s["prev_x"][hit]
+        y[hit] = s["prev_y"][hit]
+        vx[hit] = -vx[hit]
+        self.cruise[hit] = vx[hit]
+        s["stuck"][:] = np.where(hit, np.minimum(s["stuck"] + 1, STUCK_STEPS), 0)
+        self._arrive()
+
+        span = self.max_x - self.min_x
+        wrapped = (x < self.min_x) | (x >= self.max_x)
+        x[:] = (x - self.min_x) % span + self.min_x
+        s["prev_x"][wrapped] = x[wrapped]  # no interpolating across the wrap
+        s["prev_y"][wrapped] = y[wrapped]
+
+        anim_ms = s["anim_ms"]
+        anim_ms[walkers] += step_ms
+        turned = walkers & (anim_ms >= PEDESTRIAN_ANIMATION_MS)
+        anim_ms[turned] -= PEDESTRIAN_ANIMATION_MS
+        s["anim_frame"][turned] ^= 1
+
+    def _steer_customers(self):
+        # One field lookup per goal for all the customers heading there
+        s = self.store
+        goal = s["goal"]
+        for index, name in enumerate(self.goals):
+            rows = np.flatnonzero(goal == index)
+            if not len(rows):
+                continue
+            field = self.navigation.field(name)
+            dx, dy = field.steer(s["x"][rows] + s["w"][rows] / 2, s["y"][rows] + s["h"][rows] / 2)
+            speed = np.abs(self.cruise[rows])
+            s["vx"][rows] = dx * speed
+            s["vy"][rows] = dy * speed
+
+    def _arrive(self):
+        # Customers at their goal go in, and a new one turns up somewhere on
+        # the sidewalk with a (possibly) different goal
+        s = self.store
+        for index, name in enumerate(self.goals):
+            rows = np.flatnonzero(s["goal"] == index)
+            if not len(rows):
+                continue
+            field = self.navigation.field(name)
+            done = field.reached(s["x"][rows] + s["w"][rows] / 2, s["y"][rows] + s["h"][rows] / 2)
+            self._respawn(rows[done | (s["stuck"][rows] >= STUCK_STEPS)])
+
+    def _respawn(self, rows):
+        # Rows whose spot turns out to be in a building try again next step
+        if not len(rows):
+            return
+        s = self.store
+        x = self.rng.uniform(self.min_x, self.max_x, len(rows))
+        y = self.sidewalk_y + self.rng.uniform(0, 20, len(rows))
+        clear = ~overlapping(x, y, s["w"][rows], s["h"][rows], self.blockers)
+        rows, x, y = rows[clear], x[clear], y[clear]
+        s["x"][rows] = s["prev_x"][rows] = x
+        s["y"][rows] = s["prev_y"][rows] = y
+        s["vy"][rows] = 0
+        s["stuck"][rows] = 0
+        s["goal"][rows] = self.rng.integers(0, len(self.goals), len(rows))
+
+    def visible(self, camera_x, width):
+        # Row indices of everything within width of camera_x
+        s = self.store
+        x = s["x"]
+        return np.flatnonzero((x + s["w"] > camera_x) & (x < camera_x + width))
+
+    def submit(self, queue, camera_x, width, alpha=1.0):
+        # Queues the visible entities (render.RenderQueue) at positions
+        # interpolated between the last two steps; the queue sorts them by y
+        s = self.store
+        rows = self.visible(camera_x, width)
+        if not len(rows):
+            return
+        x = (s["prev_x"][rows] + (s["x"][rows] - s["prev_x"][rows]) * alpha).astype(int).tolist()
+        y = (s["prev_y"][rows] + (s["y"][rows] - s["prev_y"][rows]) * alpha).astype(int).tolist()
+        bottom = (s["y"][rows] + s["h"][rows]).tolist()
+        kinds, colors, frames = s["kind"][rows].tolist(), s["color"][rows].tolist(), s["anim_frame"][rows].tolist()
+        for i in range(len(rows)):
+            queue.sprite(sprite(kinds[i], colors[i], frames[i]), (x[i], y[i]), sort_y=bottom[i])
+
+
+# --- Sprites ---
+# One small surface per (kind, color, animation frame), drawn on first use
+_sprites = {}
+
+
+def sprite(kind, color, frame):
+    key = (kind, color, frame)
+    surface = _sprites.get(key)
+    if surface is None:
+        if kind == CAR:
+            w, h = CAR_SIZE
+            surface = pygame.Surface(CAR_SIZE)
+            surface.fill(CAR_COLORS[color])
+            surface.fill((150, 200, 230), (w // 4, 3, w // 2, h // 3))  # windows
+        else:
+            w, h = PEDESTRIAN_SIZE
+            surface = pygame.Surface(PEDESTRIAN_SIZE, pygame.SRCALPHA)
+            surface.fill(PEDESTRIAN_COLORS[color], (0, 6 + frame, w, h - 6 - frame))
+            surface.fill((230, 190, 150), (2, frame, w - 4, 6))  # head
+        _sprites[key] = memory.track("traffic_sprites", surface)
+    return surface
@@ -0,0 +1,194 @@
+from collections import namedtuple
+from dataclasses import dataclass, replace
+
+import pygame
+
+import collision
+import entities
+import levels
+import navigation
+import profiler
+from settings import WIDTH, HEIGHT, FPS, PLAYER_SIZE, PLAYER_SPEED
+
+# --- Simulation ---
+# step() is the whole game update: it takes the current state, one step's
+# input and the static world, and returns the next state without touching the
+# display, the clock or any globals. main() runs it at a fixed rate; it runs
+# just as well with no window at all.
+STEP_MS = 1000 / FPS
+ANIMATION_MS = 150  # Time between walk animation frames
+
+# Only one pizza building at x=2600
+PIZZA_BUILDING_X = 2600
+
+# Where the player ends up after exiting the house / entering the Big Pizza
+HOUSE_EXIT_POS = (400, HEIGHT // 2 + 110)
+BIG_PIZZA_INSIDE_POS = (3000, HEIGHT // 2)
+
+# skip (Escape) is only read by cutscenes; step() ignores it
+Input = namedtuple("Input", "up down left right interact skip")
+NO_INPUT = Input(False, False, False, False, False, False)
+
+
+def read_input(keys):
+    # keys is anything indexable by pygame key codes, e.g. key.get_pressed()
+    return Input(bool(keys[pygame.K_w]), bool(keys[pygame.K_s]), bool(keys[pygame.K_a]),
+                 bool(keys[pygame.K_d]), bool(keys[pygame.K_e]), bool(keys[pygame.K_ESCAPE]))
+
+
+World = namedtuple("World", "house_level street_level house_grid street_grid door_rect "
+                            "big_pizza_rect big_pizza_entrance pizza_building_entrance "
+                            "house_nav street_nav")
+
+# Walkable areas for navigation (see navigation.py): the room, and the strip
+# of street from the start of the block to the barrier
+HOUSE_BOUNDS = (0, 0, WIDTH, HEIGHT)
+STREET_BOUNDS = (-200, HEIGHT // 2, 4650, HEIGHT // 2)
+
+
+def load_world(house_path="game/levels/house.tmx", street_path="game/levels/street.tmx"):
+    house_level = levels.load(house_path)
+    street_level = levels.load(street_path)
+    entrances = {obj.name: obj.rect for obj in street_level.objects if obj.group == "entrances"}
+    return World(
+        house_level=house_level,
+        street_level=street_level,
+        house_grid=collision.SpatialGrid(house_level.rects("collision")),
+        street_grid=collision.SpatialGrid(street_level.rects("collision")),
+        # Door interaction zone inside house (slightly bigger for easier interaction)
+        door_rect=house_level.find("door").rect,
+        big_pizza_rect=street_level.find("big_pizza").rect,  # Big building blocking road
+        big_pizza_entrance=street_level.find("big_pizza_entrance").rect,  # Center entrance area
+        pizza_building_entrance=street_level.find("pizza_building_entrance").rect,
+        # Flow fields towards the door and each entrance, built on first use
+        house_nav=navigation.FlowFields(house_level.rects("collision"), HOUSE_BOUNDS,
+                                        {"door": house_level.find("door").rect}, clearance=PLAYER_SIZE),
+        street_nav=navigation.FlowFields(street_level.rects("collision"), STREET_BOUNDS, entrances,
+                                         clearance=entities.PEDESTRIAN_SIZE),
+    )
+
+
+@dataclass(frozen=True)
+class GameState:
+    inside_house: bool = True
+    # Player starts in front of bed (adjusted to not overlap bed). Outside,
+    # player_x stays put and camera_x scrolls instead.
+    player_x: float = 635
+    player_y: float = 400
+    camera_x: float = 0
+    direction: str = "down"
+    moving: bool = False
+    animation_frame: int = 0
+    animation_ms: float = 0
+    e_pressed: bool = False
+    can_interact: bool = False
+    pizza_buildings_passed: int = 0
+    time_ms: float = 0
+    # What happened during this step, e.g. ("exit_house",)
+    events: tuple = ()
+
+
+def step(state, inp, world):
+    inside_house = state.inside_house
+    direction = state.direction
+    camera_x = state.camera_x
+    player_x, player_y = state.player_x, state.player_y
+    prev_pos = (player_x, player_y)
+    events = []
+
+    # --- Movement ---
+    dx = dy = 0
+    if inp.up:
+        dy = -PLAYER_SPEED
+        direction = "up"
+    elif inp.down:
+        dy = PLAYER_SPEED
+        direction = "down"
+    if inside_house:
+        if inp.left:
+            dx = -PLAYER_SPEED
+            direction = "left"
+        elif inp.right:
+            dx = PLAYER_SPEED
+            direction = "right"
+    else:
+        # Don't move player on screen, move camera instead
+        if inp.right:
+            direction = "right"
+            camera_x += PLAYER_SPEED
+        elif inp.left and camera_x > 0:
+            direction = "left"
+            camera_x -= PLAYER_SPEED
+
+    # Update pizza_buildings_passed once the camera passes the pizza building - some margin
+    pizza_buildings_passed = 1 if camera_x > PIZZA_BUILDING_X - 100 else 0
+
+    if inside_house:
+        player_x += dx
+        player_y += dy
+    else:
+        player_y += dy  # Only Y movement updates player position
+
+    # Collision with walls or city buildings
+    with profiler.section("collision"):
+        player_rect = pygame.Rect(player_x, player_y, PLAYER_SIZE[0], PLAYER_SIZE[1])
+        collidable = world.house_grid if inside_house else world.street_grid
+        if collidable.first_overlap(player_rect) is not None:
+            player_x, player_y = prev_pos
+            player_rect.topleft = prev_pos
+
+    # --- Interaction ---
+    e_pressed = state.e_pressed
+    can_interact = False
+    if inside_house:
+        # Keep inflation inside house for easier door exit detection
+        can_interact = player_rect.inflate(10, 10).colliderect(world.door_rect)
+        if can_interact and inp.interact and not e_pressed:
+            inside_house = False
+            # Move player outside near house entrance
+            player_x, player_y = HOUSE_EXIT_POS
+            e_pressed = True
+            events.append("exit_house")
+    else:
+        # Player X is fixed at the center of the screen, so compare in screen coords
+        pizza_entrance_screen_rect = world.big_pizza_entrance.move(-camera_x, 0)
+        player_screen_rect = pygame.Rect(WIDTH // 2 - PLAYER_SIZE[0] // 2, player_y, PLAYER_SIZE[0], PLAYER_SIZE[1])
+        if player_screen_rect.colliderect(pizza_entrance_screen_rect):
+            can_interact = True
+            if inp.interact and not e_pressed:
+                # Teleport player inside the pizza place
+                player_x, player_y = BIG_PIZZA_INSIDE_POS
+                e_pressed = True
+                events.append("enter_big_pizza")
+
+    # Reset e_pressed only once E is released
+    if not inp.interact:
+        e_pressed = False
+
+    # --- Animation (only while moving) ---
+    moving = dx != 0 or dy != 0
+    animation_frame = state.animation_frame
+    animation_ms = state.animation_ms + STEP_MS
+    if moving:
+        if animation_ms > ANIMATION_MS:
+            animation_frame = (animation_frame + 1) % 3
+            animation_ms = 0
+    else:
+        animation_frame = 0  # Idle frame
+
+    return replace(
+        state,
+        inside_house=inside_house,
+        player_x=player_x,
+        player_y=player_y,
+        camera_x=camera_x,
+        direction=direction,
+        moving=moving,
+        animation_frame=animation_frame,
+        animation_ms=animation_ms,
+        e_pressed=e_pressed,
+        can_interact=can_interact,
+        pizza_buildings_passed=pizza_buildings_passed,
+        time_ms=state.time_ms + STEP_MS,
+        events=tuple(events),
+    )
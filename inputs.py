@@ -0,0 +1,152 @@
+import struct
+from collections import namedtuple
+
+import pygame
+
+import game
+import profiler
+
+# --- Input sources ---
+# The game reads one Frame per rendered frame from an input source instead of
+# polling pygame directly: how long the frame took, the movement/interact keys
+# held, and whether any key went down/up, the window was closed or exposed.
+# keydowns lists the key codes pressed this frame for debug keys (e.g. the
+# profiler overlay); it is not recorded, so replays never toggle debug state.
+# DEBUG_KEYS only ever show up there: they don't count as a key going down or
+# up, so toggling an overlay never advances a cutscene.
+# LiveInput polls pygame, Recorder logs frames to a file as they go by, and
+# Replayer plays a file back without waiting on the real clock.
+#
+# next_frame(fps, wait_ms): with wait_ms (see pacing.py) LiveInput sleeps in
+# pygame.event.wait until an event arrives or wait_ms is up instead of
+# ticking at fps; the other sources ignore it. Frames that waited say so
+# (waited), and that is recorded, so a replay treats their time the same
+# way the live run did whatever its own pacing does.
+#
+# Recording layout: FILE_HEADER, then one FRAME record per frame. Keys are a
+# bit per game.Input field, in field order.
+FILE_MAGIC = b"INPT"
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+FRAME = struct.Struct("<HBB")
+
+PRESSED = 1
+RELEASED = 2
+QUIT = 4
+EXPOSE = 8
+WAITED = 16
+
+DEBUG_KEYS = frozenset((pygame.K_F3, pygame.K_F4))
+
+Frame = namedtuple("Frame", "ms keys pressed released quit expose keydowns waited", defaults=((), False))
+
+
+def pack_keys(inp):
+    bits = 0
+    for i, held in enumerate(inp):
+        if held:
+            bits |= 1 << i
+    return bits
+
+
+def unpack_keys(bits):
+    return game.Input(*(bool(bits & (1 << i)) for i in range(len(game.Input._fields))))
+
+
+class LiveInput:
+    def __init__(self, clock):
+        self.clock = clock
+
+    def next_frame(self, fps=0, wait_ms=None):
+        pending = []
+        if wait_ms:
+            with profiler.section("idle"):
+                event = pygame.event.wait(wait_ms)
+            if event.type != pygame.NOEVENT:
+                pending.append(event)
+        ms = self.clock.tick(fps)
+        pressed = released = quit = expose = False
+        keydowns = []
+        with profiler.section("events"):
+            for event in pending + pygame.event.get():
+                if event.type == pygame.QUIT:
+                    quit = True
+                elif event.type == pygame.KEYDOWN:
+                    pressed = pressed or event.key not in DEBUG_KEYS
+                    keydowns.append(event.key)
+                elif event.type == pygame.KEYUP:
+                    released = released or event.key not in DEBUG_KEYS
+                elif event.type == pygame.VIDEOEXPOSE:
+                    expose = True
+            keys = game.read_input(pygame.key.get_pressed())
+        return Frame(ms, keys, pressed, released, quit, expose, tuple(keydowns), bool(wait_ms))
+
+    def close(self):
+        pass
+
+
+class Recorder:
+    def __init__(self, source, path, fps):
+        self.source = source
+        self.file = open(path, "wb")
+        self.file.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, fps))
+
+    def next_frame(self, fps=0, wait_ms=None):
+        frame = self.source.next_frame(fps, wait_ms)
+        # Frames longer than 65s are clamped; they only happen in a debugger
+        ms = min(frame.ms, 0xFFFF)
+        flags = ((PRESSED if frame.pressed else 0) | (RELEASED if frame.released else 0)
+                 | (QUIT if frame.quit else 0) | (EXPOSE if frame.expose else 0)
+                 | (WAITED if frame.waited else 0))
+        self.file.write(FRAME.pack(ms, pack_keys(frame.keys), flags))
+        return frame._replace(ms=ms)
+
+    def close(self):
+        self.file.close()
+        self.source.close()
+
+
+class Replayer:
+    # Unthrottled: frames come back as fast as they are asked for, each with
+    # its recorded duration. Once the recording runs out every frame is a quit.
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, self.fps = FILE_HEADER.unpack_from(data)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError("%s is not an input recording" % path)
+        self.frames = [
+            Frame(ms, unpack_keys(keys), bool(flags & PRESSED), bool(flags & RELEASED),
+                  bool(flags & QUIT), bool(flags & EXPOSE), waited=bool(flags & WAITED))
+            for ms, keys, flags in FRAME.iter_unpack(data[FILE_HEADER.size:])
+        ]
+        self.position = 0
+
+    @property
+    def finished(self):
+        return self.position >= len(self.frames)
+
+    def next_frame(self, fps=0, wait_ms=None):
+        # Keep SDL's queue drained even though nothing in it is used
+        pygame.event.get()
+        if self.finished:
+            return Frame(0, game.NO_INPUT, False, False, True, False)
+        frame = self.frames[self.position]
+        self.position += 1
+        return frame
+
+    def close(self):
+        pass
+
+
+def write_script(path, segments, fps=60):
+    # Builds a recording from [(Input, duration_ms, tap), ...] so scripted
+    # walkthroughs can be replayed headless, e.g. in CI. tap makes the
+    # segment's first frame a key press and release (advances the cutscene).
+    frame_ms = round(1000 / fps)
+    with open(path, "wb") as f:
+        f.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, fps))
+        for inp, duration_ms, tap in segments:
+            for n in range(max(1, round(duration_ms / frame_ms))):
+                flags = PRESSED | RELEASED if tap and n == 0 else 0
+                f.write(FRAME.pack(frame_ms, pack_keys(inp), flags))
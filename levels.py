@@ -0,0 +1,285 @@
+import base64
+import gzip
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+from xml.etree import ElementTree
+
+import pygame
+
+# --- Levels ---
+# Tiled .tmx maps are parsed once and compiled into a small binary file under
+# CACHE_DIR. Later loads memory-map that file instead of touching the XML, and
+# a map is only recompiled when its source file's size or mtime changes.
+#
+# Compiled layout (little-endian):
+#   header | meta json | pad to 4 | tile layers (uint32 gids) | rects (4 x int32)
+# The meta json holds everything small: names, object groups/types, properties.
+# Tile layers keep their map order; Tiled allows two layers with one name.
+CACHE_DIR = os.path.join(".cache", "levels")
+MAGIC = b"LVL1"
+VERSION = 1
+HEADER = struct.Struct("<4sHHqqIIIIIIII")
+RECT = struct.Struct("<iiii")
+
+LevelObject = namedtuple("LevelObject", "group name type rect properties")
+TileLayer = namedtuple("TileLayer", "name gids properties")
+
+
+def _parse_properties(elem):
+    props = {}
+    if elem is None:
+        return props
+    for prop in elem.findall("property"):
+        kind = prop.get("type", "string")
+        value = prop.get("value")
+        if value is None:
+            value = prop.text or ""
+        if kind == "int":
+            value = int(value)
+        elif kind == "float":
+            value = float(value)
+        elif kind == "bool":
+            value = value == "true"
+        elif kind == "color":
+            value = _parse_color(value)
+        props[prop.get("name")] = value
+    return props
+
+
+def _parse_color(value):
+    # Tiled writes #AARRGGBB (or #RRGGBB); pygame wants (r, g, b[, a])
+    value = value.lstrip("#")
+    if len(value) == 8:
+        a, r, g, b = (int(value[i:i + 2], 16) for i in range(0, 8, 2))
+        return (r, g, b) if a == 255 else (r, g, b, a)
+    return tuple(int(value[i:i + 2], 16) for i in range(0, 6, 2))
+
+
+def _parse_tile_data(data, count):
+    encoding = data.get("encoding")
+    compression = data.get("compression")
+    if encoding == "csv":
+        gids = array("I", (int(v) for v in data.text.replace("\n", "").split(",") if v.strip()))
+    elif encoding == "base64":
+        raw = base64.b64decode(data.text.strip())
+        if compression == "zlib":
+            raw = zlib.decompress(raw)
+        elif compression == "gzip":
+            raw = gzip.decompress(raw)
+        elif compression:
+            raise ValueError("unsupported tile compression: %s" % compression)
+        gids = array("I")
+        gids.frombytes(raw)
+        if sys.byteorder != "little":
+            gids.byteswap()
+    elif encoding is None:
+        gids = array("I", (int(tile.get("gid", 0)) for tile in data.findall("tile")))
+    else:
+        raise ValueError("unsupported tile encoding: %s" % encoding)
+    if len(gids) != count:
+        raise ValueError("tile layer has %d tiles, expected %d" % (len(gids), count))
+    return gids
+
+
+def parse_tmx(path):
+    # Streamed with iterparse; each layer/object group is dropped from its
+    # parent as soon as it has been read, so big maps never sit in memory whole.
+    level = {"properties": {}, "layers": [], "objects": []}
+    stack = []
+    for event, elem in ElementTree.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if not stack:
+                if elem.tag != "map":
+                    raise ValueError("%s is not a Tiled map" % path)
+                if elem.get("infinite") == "1":
+                    raise ValueError("infinite Tiled maps are not supported: %s" % path)
+                level["width"] = int(elem.get("width"))
+                level["height"] = int(elem.get("height"))
+                level["tilewidth"] = int(elem.get("tilewidth"))
+                level["tileheight"] = int(elem.get("tileheight"))
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if elem.tag == "layer":
+            count = level["width"] * level["height"]
+            gids = _parse_tile_data(elem.find("data"), count)
+            level["layers"].append((elem.get("name", ""), gids, _parse_properties(elem.find("properties"))))
+        elif elem.tag == "objectgroup":
+            group = elem.get("name", "")
+            for obj in elem.findall("object"):
+                rect = (
+                    round(float(obj.get("x", 0))),
+                    round(float(obj.get("y", 0))),
+                    round(float(obj.get("width", 0))),
+                    round(float(obj.get("height", 0))),
+                )
+                # Tiled 1.9+ writes "class", older versions write "type"
+                kind = obj.get("class") or obj.get("type") or group
+                props = _parse_properties(obj.find("properties"))
+                level["objects"].append((group, obj.get("name", ""), kind, rect, props))
+        elif elem.tag == "properties" and parent is not None and len(stack) == 1:
+            level["properties"] = _parse_properties(elem)
+        elif elem.tag != "tileset":
+            continue
+        parent.remove(elem)
+
+    if "width" not in level:
+        raise ValueError("%s is empty" % path)
+    return level
+
+
+def compile_tmx(path, out_path):
+    level = parse_tmx(path)
+    stat = os.stat(path)
+    meta = json.dumps({
+        "properties": level["properties"],
+        "layers": [[name, props] for name, _gids, props in level["layers"]],
+        "objects": [[group, name, kind, props] for group, name, kind, _rect, props in level["objects"]],
+    }).encode("utf-8")
+    pad = -(HEADER.size + len(meta)) % 4
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(
+                MAGIC, VERSION, 0, stat.st_mtime_ns, stat.st_size,
+                level["width"], level["height"], level["tilewidth"], level["tileheight"],
+                len(level["layers"]), len(level["objects"]), len(meta), pad,
+            ))
+            f.write(meta)
+            f.write(b"\0" * pad)
+            for _name, gids, _props in level["layers"]:
+                if sys.byteorder != "little":
+                    gids = array("I", gids)
+                    gids.byteswap()
+                f.write(gids.tobytes())
+            for obj in level["objects"]:
+                f.write(RECT.pack(*obj[3]))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, out_path)
+
+
+class Level:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = view = memoryview(self._map)
+        self.layers = []
+
+        (magic, version, _reserved, self.source_mtime_ns, self.source_size,
+         self.width, self.height, self.tile_width, self.tile_height,
+         n_layers, n_objects, meta_len, pad) = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("%s is not a compiled level (version %d)" % (path, VERSION))
+        layer_bytes = self.width * self.height * 4
+        if len(view) != HEADER.size + meta_len + pad + n_layers * layer_bytes + n_objects * RECT.size:
+            self.close()
+            raise ValueError("%s is truncated or corrupt" % path)
+
+        offset = HEADER.size
+        try:
+            meta = json.loads(bytes(view[offset:offset + meta_len]))
+        except ValueError:
+            self.close()
+            raise ValueError("%s is truncated or corrupt" % path)
+        offset += meta_len + pad
+        self.properties = meta["properties"]
+
+        # Tile layers stay in the mapped file; each one is a flat uint32 view
+        for name, props in meta["layers"]:
+            gids = view[offset:offset + layer_bytes]
+            if sys.byteorder == "little":
+                gids = gids.cast("I")
+            else:
+                gids = array("I", gids)
+                gids.byteswap()
+            self.layers.append(TileLayer(name, gids, props))
+            offset += layer_bytes
+
+        self.objects = []
+        for group, name, kind, props in meta["objects"]:
+            rect = pygame.Rect(RECT.unpack_from(view, offset))
+            self.objects.append(LevelObject(group, name, kind, rect, props))
+            offset += RECT.size
+        if n_objects != len(self.objects) or n_layers != len(self.layers):
+            self.close()
+            raise ValueError("%s is truncated or corrupt" % path)
+
+    def layer(self, name):
+        # The first tile layer called name
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        raise KeyError(name)
+
+    def tile(self, layer, x, y):
+        # layer: a name or an index into layers
+        layer = self.layers[layer] if isinstance(layer, int) else self.layer(layer)
+        return layer.gids[y * self.width + x]
+
+    def objects_in(self, group):
+        return [obj for obj in self.objects if obj.group == group]
+
+    def rects(self, group=None, kind=None):
+        return [obj.rect.copy() for obj in self.objects
+                if (group is None or obj.group == group) and (kind is None or obj.type == kind)]
+
+    def find(self, name):
+        for obj in self.objects:
+            if obj.name == name:
+                return obj
+        raise KeyError(name)
+
+    def close(self):
+        for layer in self.layers:
+            if isinstance(layer.gids, memoryview):
+                layer.gids.release()
+        self.layers = []
+        if self._map is not None:
+            self._view.release()
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+
+def cache_path(path, cache_dir=CACHE_DIR):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, name + ".lvl")
+
+
+def _is_fresh(compiled, stat):
+    try:
+        with open(compiled, "rb") as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return False
+    if len(header) != HEADER.size:
+        return False
+    magic, version, _reserved, mtime_ns, size = HEADER.unpack(header)[:5]
+    return magic == MAGIC and version == VERSION and mtime_ns == stat.st_mtime_ns and size == stat.st_size
+
+
+def load(path, cache_dir=CACHE_DIR):
+    stat = os.stat(path)
+    compiled = cache_path(path, cache_dir)
+    if not _is_fresh(compiled, stat):
+        compile_tmx(path, compiled)
+    try:
+        return Level(compiled)
+    except ValueError:
+        # The stamp matched but the file is damaged (e.g. a write cut short)
+        compile_tmx(path, compiled)
+        return Level(compiled)
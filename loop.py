@@ -0,0 +1,32 @@
+# --- Fixed timestep ---
+# The simulation advances in fixed steps of step_ms no matter how long a frame
+# took. Slow frames are caught up with several steps (at most max_steps, after
+# which the leftover time is dropped so the game slows down instead of
+# spiralling), and fast frames may run no step at all. alpha is how far the
+# renderer is between the previous and the current step, for interpolation.
+class FixedTimestep:
+    def __init__(self, step_ms, max_steps=5):
+        self.step_ms = step_ms
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped_ms = 0.0
+
+    def advance(self, frame_ms):
+        # Returns how many simulation steps to run for a frame of frame_ms
+        self.accumulator += frame_ms
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            self.dropped_ms += (steps - self.max_steps) * self.step_ms
+            steps = self.max_steps
+            self.accumulator = self.accumulator % self.step_ms
+        else:
+            self.accumulator -= steps * self.step_ms
+        return steps
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.step_ms
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t
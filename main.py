@@ -1,621 +1,558 @@
-import pygame
+import time
+STARTUP_BEGAN = time.perf_counter()
+
+import argparse
+import os
 import sys
 import math
-import numpy as np  # Required for movie frame conversion
-from moviepy import VideoFileClip
-
-# --- Settings ---
-WIDTH, HEIGHT = 800, 600
-FPS = 60
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-BG_COLOR = (245, 235, 220)  # Light tan
-WALL_COLOR = (80, 60, 50)
-PLAYER_SIZE = (32, 45)
-PLAYER_SPEED = 2.3
-
-pizza_buildings_passed = 0
-dialogue_shown = False
-dialogue_timer = None
-dialogue_duration = 4000  # 4 seconds
-
-
-# --- Initialize ---
-pygame.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("A Day in the Life of a New Yorker")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont(None, 32)
-
-pizza_building_entrance = pygame.Rect(WIDTH//2 + 400, HEIGHT//2 - 150, 100, 150)
-
-
-player_direction = "down"
-animation_frame = 0
-animation_speed = 150
-last_frame_update = pygame.time.get_ticks()
-walls = []
 
-def load_and_scale(path):
-    img = pygame.image.load(path).convert_alpha()
-    return pygame.transform.smoothscale(img, PLAYER_SIZE)
+# --- Command line ---
+# --headless runs on SDL's dummy video driver and never presents a frame;
+# combined with --replay it plays a recorded session back as fast as the
+# CPU allows (see inputs.py). --profile times each part of the frame (F3
+# shows the overlay) and writes the samples to PATH on exit. --quality picks
+# a render quality level, or "auto" to trade resolution and effects for
+# frame time (see quality.py); headless runs default to "high". --memory
+# traces allocations across scene changes and writes the memory report
+# (see memory.py; F4 shows the overlay) to PATH on exit.
+parser = argparse.ArgumentParser(description="A Day in the Life of a New Yorker")
+parser.add_argument("--headless", action="store_true", help="no window; skip presenting frames")
+parser.add_argument("--record", metavar="PATH", help="record per-frame input to PATH")
+parser.add_argument("--replay", metavar="PATH", help="play input back from PATH instead of the keyboard")
+parser.add_argument("--profile", metavar="PATH", help="profile frame phases and write them to PATH on exit")
+parser.add_argument("--telemetry", metavar="URL",
+                    help="send gameplay events to an ingest endpoint (see telemetry_server.py)")
+parser.add_argument("--quality", choices=("auto", "high", "medium", "low", "lowest"),
+                    help="render quality level (default: auto)")
+parser.add_argument("--memory", metavar="PATH", help="trace memory per scene and write a report to PATH on exit")
+parser.add_argument("--profile-format", choices=("json", "chrome"), default="json",
+                    help="json stats and samples, or a chrome://tracing trace")
+args = parser.parse_args()
+if args.headless:
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
 
-player_animations = {
-    "up": [load_and_scale(f"pokemon_forward_{i}.png") for i in range(1, 4)],
-    "down": [load_and_scale(f"pokemon_backward_{i}.png") for i in range(1, 4)],
-    "left": [load_and_scale(f"pokemon_left_{i}.png") for i in range(1, 4)],
-    "right": [load_and_scale(f"pokemon_right_{i}.png") for i in range(1, 4)],
-}
-
-# Player starts in front of bed (adjusted to not overlap bed)
-player_pos = [635, 400]
+import pygame
 
-# Door interaction zone inside house (slightly bigger for easier interaction)
-door_rect = pygame.Rect(370, 480, 60, 30)
+import assets
+import chunks
+import cutscene
+import entities
+import game
+import inputs
+import loop
+import memory
+import overlays
+import pacing
+import profiler
+import quality
+import render
+import scenes
+import scenery
+import startup
+import telemetry
+import text
+import video
+from settings import (
+    WIDTH, HEIGHT, FPS, MAX_RENDER_FPS, MAX_CATCHUP_STEPS, FRAME_BUDGET_MS, WHITE, BLACK,
+    PLAYER_SIZE,
+)
+
+# Heavy modules (moviepy, numpy) are only imported by the code that needs
+# them, and the assets the house doesn't need are loaded in the background
+# while the opening cutscene plays (see the bottom of this file).
+timings = startup.StartupTimer(STARTUP_BEGAN)
+timings.record("imports", STARTUP_BEGAN, time.perf_counter())
 
-# --- City buildings collision rects ---
-city_buildings = []
+dialogue_shown = False
+dialogue_timer = None
+dialogue_duration = 4000  # 4 seconds
 
-def init_city_buildings():
-    global city_buildings
-    city_buildings.clear()
-    building_positions = [100, 250, 400, 550, 700]
-    building_width = 80
-    building_height = 150
-    for x in building_positions:
-        rect = pygame.Rect(x, HEIGHT//2 - building_height, building_width, building_height)
-        city_buildings.append(rect)
 
-init_city_buildings()
+# --- Initialize ---
+with timings.phase("display"):
+    pygame.init()
+    screen = memory.track("display", pygame.display.set_mode((WIDTH, HEIGHT)))
+    pygame.display.set_caption("A Day in the Life of a New Yorker")
+    clock = pygame.time.Clock()
+    font = text.get_font(None, 32)
+
+if args.replay:
+    input_source = inputs.Replayer(args.replay)
+else:
+    input_source = inputs.LiveInput(clock)
+if args.record:
+    input_source = inputs.Recorder(input_source, args.record, FPS)
+if args.profile:
+    profiler.enable()
+    profiler.overlay_visible = not args.headless
+if args.memory:
+    memory.start_tracing()
+
+quality_mode = args.quality or ("high" if args.headless else "auto")
+governor = quality.Governor(FRAME_BUDGET_MS, auto=quality_mode == "auto",
+                            start=0 if quality_mode == "auto" else quality.level_named(quality_mode))
+
+# Gameplay events go on telemetry's queue and are sent from its own thread
+if args.telemetry:
+    events = telemetry.Telemetry(args.telemetry)
+else:
+    events = telemetry.NullTelemetry()
+events.emit("session_start", headless=args.headless, replay=bool(args.replay))
+
+# Frames where nothing on screen changes are skipped, and the loop waits on
+# input instead of ticking at the full rate (see pacing.py)
+pacer = pacing.Pacer(game.STEP_MS)
+
+
+def present(rects=None):
+    # Push the frame to the window (all of it, or just rects); no-op headless
+    if args.headless:
+        return
+    if rects is None:
+        pygame.display.flip()
+    else:
+        pygame.display.update(rects)
+
+
+# Frames are packed into one cached atlas (see assets.py) and loaded on first use
+player_animations = assets.SpriteAtlas({
+    "up": [f"pokemon_forward_{i}.png" for i in range(1, 4)],
+    "down": [f"pokemon_backward_{i}.png" for i in range(1, 4)],
+    "left": [f"pokemon_left_{i}.png" for i in range(1, 4)],
+    "right": [f"pokemon_right_{i}.png" for i in range(1, 4)],
+}, PLAYER_SIZE)
+
+# --- Levels ---
+# Layout lives in game/levels/*.tmx (see levels.py for the compiled cache);
+# game.load_world also builds the collision grids for both scenes.
+with timings.phase("levels"):
+    world = game.load_world()
+
+house_level = world.house_level
+street_level = world.street_level
+big_pizza_rect = world.big_pizza_rect
+big_pizza_entrance = world.big_pizza_entrance
+pizza_building_entrance = world.pizza_building_entrance
+
+# --- House background ---
+# The room never changes, so it is drawn once (scenery.build_room) into
+# room_background, the house scene's "room" asset. Frames only restore the areas the player,
+# shadow and prompt covered (see main()).
+room_background = None
 
 def draw_room(screen):
-    screen.fill(BG_COLOR)  # background outside room
-
-    room_rect = pygame.Rect(100, 100, 600, 400)
-    pygame.draw.rect(screen, (150, 110, 75), room_rect)  # interior floor
-
-    walls.clear()
-
-    top = pygame.Rect(100, 100, 600, 10)
-    bottom = pygame.Rect(100, 490, 600, 10)
-    left = pygame.Rect(100, 100, 10, 400)
-    right = pygame.Rect(690, 100, 10, 400)
-    for wall in [top, bottom, left, right]:
-        pygame.draw.rect(screen, WALL_COLOR, wall)
-        walls.append(wall)
-
-    # Bed adjusted so player can stand near door, not stuck inside bed
-    bed = pygame.Rect(600, 460, 70, 40)
-    pygame.draw.rect(screen, (180, 100, 120), bed)
-    walls.append(bed)
-
-    pygame.draw.rect(screen, (180, 160, 120), pygame.Rect(370, 480, 60, 30))  # door
-
-    desk = pygame.Rect(130, 130, 60, 30)
-    pygame.draw.rect(screen, (160, 120, 90), desk)
-    walls.append(desk)
-
-    bookshelf = pygame.Rect(200, 130, 20, 60)
-    pygame.draw.rect(screen, (100, 70, 50), bookshelf)
-    walls.append(bookshelf)
-
-    tv = pygame.Rect(130, 100, 60, 20)
-    pygame.draw.rect(screen, (20, 20, 20), tv)
-    walls.append(tv)
+    screen.blit(room_background, (0, 0))
 
-    wardrobe = pygame.Rect(260, 130, 40, 60)
-    pygame.draw.rect(screen, (140, 100, 80), wardrobe)
-    walls.append(wardrobe)
 
-    table = pygame.Rect(350, 300, 100, 60)
-    pygame.draw.rect(screen, (180, 140, 100), table)
-    walls.append(table)
-
-    couch = pygame.Rect(150, 400, 120, 40)
-    pygame.draw.rect(screen, (200, 100, 50), couch)
-    walls.append(couch)
-
-    counter = pygame.Rect(110, 250, 60, 20)
-    pygame.draw.rect(screen, (100, 100, 100), counter)
-    walls.append(counter)
+# --- Street ---
+# The street is drawn in world strips by scenery.render_street_chunk and cached by
+# street_chunks (see chunks.py); draw_city only blits the strips on screen.
+street_chunks = chunks.ChunkCache(
+    lambda screen, camera_x: scenery.render_street_chunk(screen, camera_x, pizza_building_entrance), HEIGHT)
 
 def draw_city(screen, camera_x):
-    screen.fill((135, 206, 235))  # Light sky blue background
-
-    # Draw ground
-    ground_rect = pygame.Rect(0, HEIGHT // 2, WIDTH, HEIGHT // 2)
-    pygame.draw.rect(screen, (50, 50, 50), ground_rect)  # street
-
-    # Sidewalk border lines
-    border_thickness = 8
-    border_color = (220, 220, 220)
-    pygame.draw.rect(screen, border_color, pygame.Rect(0, HEIGHT//2 - border_thickness, WIDTH, border_thickness))
-    pygame.draw.rect(screen, border_color, pygame.Rect(0, HEIGHT - border_thickness, WIDTH, border_thickness))
-
-    # Repeating buildings based on camera_x
-    building_width = 100
-    building_height = 150
-    spacing = 150
-
-    for i in range(-2, 10):
-        x = i * spacing - (camera_x % spacing)
-        world_x = camera_x + x
-
-        building_rect = pygame.Rect(x, HEIGHT//2 - building_height, building_width, building_height)
+    street_chunks.draw(screen, camera_x)
 
-        if world_x < 2000:
-            pygame.draw.rect(screen, (70, 70, 90), building_rect)
-        else:
-            # Pizza shop
-            pygame.draw.rect(screen, (200, 80, 30), building_rect)
-
-            # Special red sign above one enterable pizza shop at x = 2600
-            if world_x == 2600:
-                sign_rect = pygame.Rect(x + building_width // 2 - 10, HEIGHT//2 - building_height - 20, 20, 20)
-                pygame.draw.rect(screen, (255, 0, 0), sign_rect)
-
-            pygame.draw.rect(screen, (255, 255, 0), pygame.Rect(x + 20, HEIGHT//2 - 120, 60, 30))  # pizza sign background
-            font_small = pygame.font.SysFont(None, 24)
-            text = font_small.render("Pizza", True, (0, 0, 0))
-            screen.blit(text, (x + 30, HEIGHT//2 - 115))
-    
-    # Special enterable pizza building at the end
-    entrance_screen_x = pizza_building_entrance.x - camera_x
-    if 0 <= entrance_screen_x <= WIDTH:
-        pygame.draw.rect(screen, (220, 50, 50), pygame.Rect(entrance_screen_x, pizza_building_entrance.y, pizza_building_entrance.width, pizza_building_entrance.height))
-        pygame.draw.rect(screen, (255, 255, 0), pygame.Rect(entrance_screen_x + 20, pizza_building_entrance.y + 20, 60, 30))  # pizza sign
-        text = pygame.font.SysFont(None, 28).render("Pizza", True, (0, 0, 0))
-        screen.blit(text, (entrance_screen_x + 25, pizza_building_entrance.y + 25))
-
-        # --- Draw final pizza building at the end of the street ---
-    final_pizza_world_x = 4500
-    final_pizza_screen_x = final_pizza_world_x - camera_x
-    final_pizza_screen_y = HEIGHT // 2 - 80
-    final_pizza_width = 120
-    final_pizza_height = 200
 
-    # Draw building (different color so it stands out)
-    pygame.draw.rect(screen, (255, 255, 0), (final_pizza_screen_x, final_pizza_screen_y, final_pizza_width, final_pizza_height))
+# Sprites and shapes drawn over the room or street each frame (see render.py)
+render_queue = render.RenderQueue()
 
-    # Draw door
-    pygame.draw.rect(screen, (100, 100, 100), (final_pizza_screen_x + 30, final_pizza_screen_y + 140, 60, 60))
 
-    # Label on building
-    font_large = pygame.font.SysFont(None, 24)
-    label = font_large.render("Big Pizza", True, (0, 0, 0))
-    screen.blit(label, (final_pizza_screen_x + 10, final_pizza_screen_y + 10))
+# --- Traffic ---
+# Cars and pedestrians (see entities.py). Built by the loader during the
+# cutscene so numpy stays off the startup path; stepped with the simulation
+# while the player is outside.
+TRAFFIC_LANES = [(470, 3.0), (535, -3.5)]  # (y, pixels per step)
+SIDEWALK_Y = HEIGHT // 2 + 4
 
-        # --- Draw barrier at end of road before Big Pizza ---
-    barrier_world_x = 4450
-    barrier_screen_x = barrier_world_x - camera_x
-    barrier_y = HEIGHT // 2 - 20
-    barrier_width = 10
-    barrier_height = 200
+def make_traffic():
+    return entities.Traffic(TRAFFIC_LANES, SIDEWALK_Y, min_x=-200, max_x=4450,
+                            blockers=street_level.rects("collision"),
+                            cars_per_lane=24, pedestrians=160,
+                            navigation=world.street_nav, goals=["pizza_building_entrance", "big_pizza_entrance"],
+                            customers=40)
 
-    # Draw a vertical black barrier
-    pygame.draw.rect(screen, (0, 0, 0), (barrier_screen_x, barrier_y, barrier_width, barrier_height))
 
-        # Darken road beyond the barrier to make it look closed
-    road_overlay_rect = pygame.Rect(barrier_screen_x + barrier_width, barrier_y, WIDTH, barrier_height)
-    dark_overlay = pygame.Surface((road_overlay_rect.width, road_overlay_rect.height), pygame.SRCALPHA)
-    dark_overlay.fill((0, 0, 0, 150))  # Semi-transparent black
-    screen.blit(dark_overlay, (barrier_screen_x + barrier_width, barrier_y))
 
 
 
 
 
+# --- Cutscene ---
+# Story scenes are timelines of cutscene steps (see cutscene.py); they read
+# frames from the input source like the game does, so they record and replay.
+CUTSCENE_BG = (30, 30, 30)
 
+def run_cutscene(screen, source, font, timeline):
+    if not cutscene.Cutscene(timeline, font).run(screen, source, present, FPS, pacer):
+        source.close()
+        pygame.quit()
+        sys.exit()
 
-def is_near(rect1, rect2, distance=10):
-    # Keep inflation only if distance > 0, else no inflation (stricter)
-    if distance > 0:
-        return rect1.colliderect(rect2.inflate(distance, distance))
-    else:
-        return rect1.colliderect(rect2)
 
-# --- Cutscene ---
-def run_cutscene(screen, clock, font, dialogue_lines):
-    text_index = 0
-    letter_index = 0
-    typing_speed = 50
-    fade_alpha = 255
-    fade_speed = 3
-    done = False
-    key_released = True
-    fade_surface = pygame.Surface((WIDTH, HEIGHT))
-    fade_surface.fill((0, 0, 0))
-    fading_in = False
-    fade_to_cutscene_bg = True
-    fading_out_to_black = False
-    fade_into_game = False
-    black_pause_after_fade_out = False
-    black_pause_timer = None
-
-    initial_pause_start = pygame.time.get_ticks()
-    prompt_delay_timer = None
-    prompt_delay_duration = 1000
-    show_prompt = False
-    waiting_for_key = False
-    typewriter_timer = pygame.time.get_ticks()
-    show_first_line_timer = None
-    wait_before_typing = 1000
-
-    screen.fill((0, 0, 0))
-    pygame.display.flip()
-
-    while not done:
-        screen.fill((30, 30, 30))
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYUP:
-                key_released = True
-            elif event.type == pygame.KEYDOWN and key_released:
-                key_released = False
-                if text_index < len(dialogue_lines) and letter_index < len(dialogue_lines[text_index]):
-                    letter_index = len(dialogue_lines[text_index])
-                else:
-                    text_index += 1
-                    letter_index = 0
-                    prompt_delay_timer = None
-                    show_prompt = False
-                    waiting_for_key = False
-                    if text_index >= len(dialogue_lines):
-                        fading_out_to_black = True
-                        fade_alpha = 0
-                        black_pause_timer = pygame.time.get_ticks()
-
-        now = pygame.time.get_ticks()
-
-        if fade_to_cutscene_bg:
-            if now - initial_pause_start < 1500:
-                screen.fill((0, 0, 0))
-            else:
-                fading_in = True
-                fade_to_cutscene_bg = False
-
-        elif fading_in:
-            fade_alpha -= fade_speed
-            if fade_alpha <= 0:
-                fade_alpha = 0
-                fading_in = False
-                show_first_line_timer = pygame.time.get_ticks()
-            fade_surface.set_alpha(fade_alpha)
-            screen.blit(fade_surface, (0, 0))
-
-        elif text_index == 0 and show_first_line_timer:
-            if now - show_first_line_timer < wait_before_typing:
-                pass
-            else:
-                show_first_line_timer = None
-
-        if not fading_in and not fade_to_cutscene_bg and not show_first_line_timer and not fading_out_to_black and text_index < len(dialogue_lines):
-            line = dialogue_lines[text_index]
-            if letter_index < len(line):
-                if now - typewriter_timer > typing_speed:
-                    letter_index += 1
-                    typewriter_timer = now
-
-            rendered_text = font.render(line[:letter_index], True, WHITE)
-            screen.blit(rendered_text, (50, HEIGHT // 2))
-
-            if letter_index >= len(line):
-                if prompt_delay_timer is None:
-                    prompt_delay_timer = now
-                elif now - prompt_delay_timer >= prompt_delay_duration:
-                    if (now // 800) % 2 == 0:
-                        prompt_text = font.render("Press Any Key to Continue", True, WHITE)
-                        screen.blit(prompt_text, (50, HEIGHT // 2 + 40))
-                    waiting_for_key = True
-
-        if fading_out_to_black:
-            fade_alpha += fade_speed
-            if fade_alpha >= 255:
-                fade_alpha = 255
-                if black_pause_timer is None:
-                    black_pause_timer = now
-                elif now - black_pause_timer >= 1000:
-                    done = True
-            fade_surface.set_alpha(fade_alpha)
-            screen.blit(fade_surface, (0, 0))
-
-        pygame.display.flip()
-        clock.tick(FPS)
-        
 def play_jumpscare(screen, video_path):
-    from moviepy import VideoFileClip
-
-    clip = VideoFileClip(video_path)
-
-    # Set size to your pygame screen size
-    WIDTH, HEIGHT = screen.get_size()
-
-    for frame in clip.iter_frames(fps=clip.fps, dtype='uint8'):
-        # Convert frame (numpy array) to pygame surface
-        frame_surface = pygame.surfarray.make_surface(frame.swapaxes(0,1))
-        
-        # Resize the surface to fit screen size
-        frame_surface = pygame.transform.scale(frame_surface, (WIDTH, HEIGHT))
-        
-        # Display the frame
-        screen.blit(frame_surface, (0, 0))
-        pygame.display.update()
-        
-        # Maintain frame rate
-        pygame.time.wait(int(1000 / clip.fps))
+    # Plays from the raw frame cache when it is up to date (built in the
+    # background on first run, see below), otherwise decodes on a background
+    # thread. Either way this only paces and presents the frames. The
+    # bundled video is normally opened, with its first frames decoded, while
+    # the player walks up to the entrance (see the scenes below).
+    if args.headless:
+        # Nothing to watch; a headless walkthrough ends here
+        input_source.close()
+        pygame.quit()
+        sys.exit()
+    with profiler.section("jumpscare_open"):
+        if video_path == JUMPSCARE_VIDEO:
+            player = scene_manager.switch("jumpscare")["jumpscare"]
+        else:
+            player = open_video(video_path)
+    try:
+        player.play(screen)
+    finally:
+        player.close()
 
+    input_source.close()
     pygame.quit()
     sys.exit()
 
 
 # --- Main Game Loop ---
-def main():
-    global player_pos, player_direction, animation_frame, last_frame_update
-    global pizza_buildings_passed, dialogue_shown, dialogue_timer
-    inside_house = True
-    running = True
-    # ... rest of your code
-
-    e_pressed = False
-    camera_x = 0  # <-- Add this
+def on_screen(state):
+    # What the house frame is drawn from; while it stays the same (and no
+    # key is held) there's nothing new to draw
+    return (state.inside_house, state.player_x, state.player_y, state.direction,
+            state.animation_frame, state.can_interact)
 
-    e_pressed = False
 
-    while running:
-        dt = clock.tick(FPS)
-        keys = pygame.key.get_pressed()
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-    # Define Big Pizza Building barrier and interaction zone
-        big_pizza_rect = pygame.Rect(2600, HEIGHT // 2 - 50, 200, 200)  # Big building blocking road
-        big_pizza_entrance = pygame.Rect(2600 + 75, HEIGHT // 2 + 50, 50, 50)  # Center entrance area
-
-        # --- Movement ---
-        player_rect = pygame.Rect(player_pos[0], player_pos[1], PLAYER_SIZE[0], PLAYER_SIZE[1])
-        prev_pos = player_pos.copy()
-
-        dx = dy = 0
-        if keys[pygame.K_w]:
-            dy = -PLAYER_SPEED
-            player_direction = "up"
-        elif keys[pygame.K_s]:
-            dy = PLAYER_SPEED
-            player_direction = "down"
-        if inside_house:
-            if keys[pygame.K_a]:
-                dx = -PLAYER_SPEED
-                player_direction = "left"
-            elif keys[pygame.K_d]:
-                dx = PLAYER_SPEED
-                player_direction = "right"
-        else:
-            dx = 0  # Don't move player on screen, move camera instead
-            if keys[pygame.K_d]:
-                player_direction = "right"
-                camera_x += PLAYER_SPEED
-            elif keys[pygame.K_a] and camera_x > 0:
-                player_direction = "left"
-                camera_x -= PLAYER_SPEED
-
-        # Only one pizza building at x=2600
-        pizza_building_x = 2600
-
-        # Update pizza_buildings_passed once player/camera passes pizza_building_x - some margin
-        if camera_x > pizza_building_x - 100:
-            pizza_buildings_passed = 1
-        else:
-            pizza_buildings_passed = 0
-
-
-        
-        # Apply movement
-        # Apply movement
-        if inside_house:
-            player_pos[0] += dx
-            player_pos[1] += dy
-        else:
-            player_pos[1] += dy  # Only Y movement updates player position
-            # X movement handled via camera_x earlier; no overwrite here!
-
-
-        # Update rect
-        player_rect.topleft = player_pos
-
-        # Collision with walls or city buildings
-        # Collision with walls or city buildings
-        collidable = walls if inside_house else city_buildings.copy()
-
-        if not inside_house:
-            # Add the big pizza place as a blocking wall
-            collidable.append(big_pizza_rect)
-        for wall in collidable:
-            if player_rect.colliderect(wall):
-                player_pos = prev_pos
-                player_rect.topleft = player_pos
-                break
-
-        # Interaction zone for player (no inflation outside house, stricter)
-        # We'll keep inflation inside house for easier door exit detection
-        interaction_zone = player_rect.inflate(10, 10) if inside_house else player_rect
-
-        can_interact = False
+def main():
+    global dialogue_shown, dialogue_timer, room_background
+    running = True
 
-        if inside_house:
-            # Interaction with inside door to exit
-            can_interact = interaction_zone.colliderect(door_rect)
-            if can_interact and keys[pygame.K_e]:
-                if not e_pressed:
-                    inside_house = False
-                    # Move player outside near house entrance
-                    player_pos = [400, HEIGHT // 2 + 110]
-                    e_pressed = True
-        else:
-            can_interact = False
+    # Simulation runs at FPS fixed steps (game.step); rendering runs up to
+    # MAX_RENDER_FPS and draws positions interpolated between the last two steps
+    timestep = loop.FixedTimestep(game.STEP_MS, MAX_CATCHUP_STEPS)
+    state = prev_state = game.GameState()
 
-            # Shift big pizza entrance rect by camera offset to get screen coordinates
-            pizza_entrance_screen_rect = big_pizza_entrance.move(-camera_x, 0)
+    # Only blocks if the loader hasn't finished these during the cutscene
+    with timings.phase("wait_assets"):
+        room_background = scene_manager.switch("house")["room"]
+    traffic = None
+    first_frame = True
+    frame_summary = telemetry.FrameSummary()
+    prev_can_interact = False
 
-            # Define player's rectangle on screen (player X fixed center of screen)
-            player_screen_rect = pygame.Rect(WIDTH // 2 - PLAYER_SIZE[0] // 2, player_pos[1], PLAYER_SIZE[0], PLAYER_SIZE[1])
+    # Dirty-rect state for the house: rects drawn last frame that need the
+    # background restored, and whether the whole screen must be redrawn
+    dirty_rects = []
+    full_redraw = True
 
-            # Check collision using screen coords, not world coords
-            if player_screen_rect.colliderect(pizza_entrance_screen_rect):
-                can_interact = True
-                if keys[pygame.K_e] and not e_pressed:
+    while running:
+        frame = input_source.next_frame(MAX_RENDER_FPS, pacer.wait_ms)
+        work_began = time.perf_counter()
+        level = governor.level
+        profiler.frame()
+        if frame.quit:
+            running = False
+        if frame.expose:
+            full_redraw = True
+        if pygame.K_F3 in frame.keydowns:
+            profiler.toggle_overlay()
+            full_redraw = True
+        if pygame.K_F4 in frame.keydowns:
+            memory.toggle_overlay()
+            full_redraw = True
+
+        # --- Update ---
+        inp = frame.keys
+        # Time spent waiting for input isn't simulation time: the key that
+        # ends the wait gets one step, not a catch-up burst. frame.waited is
+        # recorded, so replays step the same whatever their own pacing does.
+        sim_ms = min(frame.ms, game.STEP_MS) if frame.waited else frame.ms
+        with profiler.section("update"):
+            for _ in range(timestep.advance(sim_ms)):
+                prev_state = state
+                state = game.step(state, inp, world)
+                for event in state.events:
+                    events.emit("scene", event=event, camera_x=round(state.camera_x))
+                if "exit_house" in state.events:
+                    # The street was prefetched as the player neared the door
+                    traffic = scene_manager.switch("street")["traffic"]
+                    room_background = None
+                if "enter_big_pizza" in state.events:
                     print("Entering the BIG PIZZA PLACE!")
-                    # Teleport player to a defined location (e.g., inside pizza place)
-                    player_pos[0] = 3000  # example X inside pizza place
-                    player_pos[1] = HEIGHT // 2
-                    e_pressed = True  # reset E press to avoid repeat
-
                     # Play jumpscare video
-                    play_jumpscare(screen, "jumpscare.mp4")
-
-
-        # Reset e_pressed once, only if E is NOT pressed this frame at all
-        if not keys[pygame.K_e]:
-            e_pressed = False
-
-        
-
-        # --- Drawing ---
-        if inside_house:
-            draw_room(screen)
+                    play_jumpscare(screen, JUMPSCARE_VIDEO)
+                if not state.inside_house:
+                    traffic.step(game.STEP_MS)
+            scene_manager.update(state)
+
+        # --- Pacing ---
+        # The street always has traffic moving; the room is still whenever
+        # the player is and no overlay is up
+        still = (state.inside_house and not full_redraw and inp == game.NO_INPUT
+                 and not (frame.pressed or frame.released or frame.keydowns)
+                 and not profiler.overlay_visible and not memory.overlay_visible
+                 and on_screen(prev_state) == on_screen(state))
+        pacer.update(None if still else 0)
+        if pacer.idle:
+            memory.poll()
+            continue
+
+        # Positions to draw at, between the previous and current step. No
+        # interpolation across a scene change (that's a teleport).
+        inside_house = state.inside_house
+        if prev_state.inside_house == inside_house:
+            alpha = timestep.alpha
+            player_pos = (loop.lerp(prev_state.player_x, state.player_x, alpha),
+                          loop.lerp(prev_state.player_y, state.player_y, alpha))
+            camera_x = loop.lerp(prev_state.camera_x, state.camera_x, alpha)
         else:
-            draw_city(screen, camera_x)
-            # Draw Big Pizza Place
-        # Draw Big Pizza Place ONLY if it's near camera (within visible screen)
-        building_screen_rect = big_pizza_rect.move(-camera_x, 0)
-        if -200 < building_screen_rect.x < WIDTH:
-            pizza_building_color = (255, 50, 50)
-            pizza_border_color = (180, 0, 0)
-
-            pygame.draw.rect(screen, pizza_building_color, building_screen_rect)
-            pygame.draw.rect(screen, pizza_border_color, building_screen_rect, 4)
-
-            # Optional: Pizza sign
-            pizza_text = font.render("PIZZA", True, (255, 255, 255))
-            screen.blit(pizza_text, (building_screen_rect.x + 60, building_screen_rect.y + 10))
+            player_pos = (state.player_x, state.player_y)
+            camera_x = state.camera_x
 
-            # DEBUG: Draw big pizza entrance rect in green with some transparency
-            pizza_entrance_screen_rect = big_pizza_entrance.move(-camera_x, 0)
-            debug_surface = pygame.Surface((pizza_entrance_screen_rect.width, pizza_entrance_screen_rect.height), pygame.SRCALPHA)
-            debug_surface.fill((0, 255, 0, 100))  # semi-transparent green
-            screen.blit(debug_surface, pizza_entrance_screen_rect.topleft)
-
-
-        # Draw player animation frame
+        # --- Drawing ---
+        # The room or street is drawn first; everything on top of it goes
+        # through render_queue (world coordinates, y-sorted). The room is
+        # always drawn at full resolution (it only redraws dirty rects); the
+        # street is drawn into a render target at the quality level's scale.
+        target, scale = screen, 1.0
+        with profiler.section("draw_scene"):
+            if inside_house:
+                if full_redraw:
+                    draw_room(screen)
+                else:
+                    for rect in dirty_rects:
+                        screen.blit(room_background, rect, rect)
+            else:
+                scale = level.scale
+                target = quality.render_target(screen, scale)
+                street_chunks.set_scale(scale)
+                draw_city(target, camera_x)
+                with profiler.section("draw_traffic"):
+                    traffic.submit(render_queue, camera_x, WIDTH, timestep.alpha)
+
+        # Big Pizza Place (culled by the queue unless it's on screen)
+        pizza_building_color = (255, 50, 50)
+        pizza_border_color = (180, 0, 0)
+        building_bottom = big_pizza_rect.bottom
+        render_queue.fill(pizza_building_color, big_pizza_rect, sort_y=building_bottom)
+        render_queue.outline(pizza_border_color, big_pizza_rect, 4, sort_y=building_bottom)
+
+        # Optional: Pizza sign
+        pizza_text = text.render(font, "PIZZA", (255, 255, 255))
+        render_queue.sprite(pizza_text, (big_pizza_rect.x + 60, big_pizza_rect.y + 10), sort_y=building_bottom)
+
+        # DEBUG: Draw big pizza entrance rect in green with some transparency
+        if level.debug:
+            render_queue.fill((0, 255, 0, 100), big_pizza_entrance, sort_y=building_bottom)  # semi-transparent green
 
-        # Show dialogue when between 2 and 4 pizza buildings passed and dialogue not yet shown
         # Show dialogue when pizza_buildings_passed >= 1 and dialogue not yet shown
-        if pizza_buildings_passed >= 1 and not dialogue_shown:
+        if state.pizza_buildings_passed >= 1 and not dialogue_shown:
             if dialogue_timer is None:
                 dialogue_timer = pygame.time.get_ticks()
-            current_time = pygame.time.get_ticks()
-            
+
             # Message box dimensions
             box_width = WIDTH - 100
             box_height = 80
             box_x = 50
             box_y = HEIGHT - box_height - 50
-            
+            box_rect = (box_x, box_y, box_width, box_height)
+
             # Colors
             box_bg_color = (255, 255, 255)
             box_border_color = (0, 0, 0)
-            
-            # Draw box background
-            pygame.draw.rect(screen, box_bg_color, (box_x, box_y, box_width, box_height))
-            # Draw box border (thicker lines)
-            pygame.draw.rect(screen, box_border_color, (box_x, box_y, box_width, box_height), 4)
-            
+
+            # Draw box background and border (thicker lines)
+            render_queue.fill(box_bg_color, box_rect, render.HUD, screen_space=True)
+            render_queue.outline(box_border_color, box_rect, 4, render.HUD, screen_space=True)
+
             # Padding inside the box
             padding_x = 15
             padding_y = 15
-            
+
             message = "What the... why are there so many pizza buildings?"
-            # Render text (wrap if needed)
             # For now, assume fits one line. If needed, split manually or use a helper function.
-            text_surface = font.render(message, True, (0, 0, 0))
-            screen.blit(text_surface, (box_x + padding_x, box_y + padding_y))
-
-            
-            # Blinking arrow at bottom right of box
-            blink_speed = 500  #
-
-
-        # Animate only when moving
-        moved = (dx != 0 or dy != 0)
-
-        now = pygame.time.get_ticks()
-        if moved:
-            if now - last_frame_update > animation_speed:
-                animation_frame = (animation_frame + 1) % 3
-                last_frame_update = now
-        else:
-            animation_frame = 0  # Reset to idle frame if not moving
+            text_surface = text.render(font, message, (0, 0, 0))
+            render_queue.sprite(text_surface, (box_x + padding_x, box_y + padding_y), render.HUD, screen_space=True)
 
-        # Draw shadow (oval under player)
         # Draw shadow (oval under player)
         shadow_width = PLAYER_SIZE[0]
         shadow_height = 12  # Flat shadow
-        shadow_surface = pygame.Surface((shadow_width, shadow_height), pygame.SRCALPHA)
-        pygame.draw.ellipse(shadow_surface, (0, 0, 0, 80), shadow_surface.get_rect())
+        shadow_surface = overlays.ellipse((shadow_width, shadow_height), (0, 0, 0, 80))
 
-        player_img = player_animations[player_direction][animation_frame]
+        # Draw player animation frame
+        player_img = player_animations[state.direction][state.animation_frame]
 
+        # The player is placed in screen coordinates (outside, player_x stays
+        # put and the camera scrolls) but sorted with the world by their feet
         if inside_house:
-            shadow_pos = (player_pos[0], player_pos[1] + PLAYER_SIZE[1] - 10)
-            screen.blit(shadow_surface, shadow_pos)
-            screen.blit(player_img, player_pos)
+            player_screen_pos = player_pos
         else:
-            player_screen_x = WIDTH // 2 - PLAYER_SIZE[0] // 2
-            player_screen_y = player_pos[1]  # Use player's Y position outside
-
-            # Draw shadow and player at same coordinates
-            shadow_pos = (player_screen_x, player_screen_y + PLAYER_SIZE[1] - 10)
-            screen.blit(shadow_surface, shadow_pos)
-            screen.blit(player_img, (player_screen_x, player_screen_y))
+            player_screen_pos = (WIDTH // 2 - PLAYER_SIZE[0] // 2, player_pos[1])  # Use player's Y position outside
+        feet = player_pos[1] + PLAYER_SIZE[1]
+        shadow_pos = (player_screen_pos[0], player_screen_pos[1] + PLAYER_SIZE[1] - 10)
+        if level.shadows:
+            render_queue.sprite(shadow_surface, shadow_pos, sort_y=feet, screen_space=True)
+        render_queue.sprite(player_img, player_screen_pos, sort_y=feet, screen_space=True)
 
-
-
-        # Draw interaction prompt text ONLY inside house near door (NO prompt outside)
         # --- Interaction Prompt (if near something interactive) ---
-        if can_interact:
+        if state.can_interact:
             prompt_text = "Press [E] to Enter" if not inside_house else "Press [E] to Exit"
 
             # Render prompt with a semi-transparent background
-            prompt_surface = font.render(prompt_text, True, WHITE)
+            prompt_surface = text.render(font, prompt_text, WHITE)
             prompt_width = prompt_surface.get_width() + 10
             prompt_height = prompt_surface.get_height() + 6
-            prompt_bg = pygame.Surface((prompt_width, prompt_height), pygame.SRCALPHA)
-            prompt_bg.fill((0, 0, 0, 180))  # semi-transparent black background
 
             # Position prompt above player
-            if inside_house:
-                x = player_pos[0] + PLAYER_SIZE[0] // 2 - prompt_width // 2
-                y = player_pos[1] - 40
+            x = player_screen_pos[0] + PLAYER_SIZE[0] // 2 - prompt_width // 2
+            y = player_pos[1] - 40
+
+            prompt_bg = (0, 0, 0, 180) if level.overlays else (0, 0, 0)  # semi-transparent black background
+            render_queue.fill(prompt_bg, (x, y, prompt_width, prompt_height), render.HUD, screen_space=True)
+            render_queue.sprite(prompt_surface, (x + 5, y + 3), render.HUD, screen_space=True)
+
+        # A scaled-down frame is scaled up to the window before the HUD goes
+        # on, so text stays sharp
+        with profiler.section("draw_queue"):
+            if target is screen:
+                frame_rects = render_queue.flush(screen, (camera_x, 0))
             else:
-                x = WIDTH // 2 - prompt_width // 2
-                y = player_pos[1] - 40
-
-            screen.blit(prompt_bg, (x, y))
-            screen.blit(prompt_surface, (x + 5, y + 3))
-
-
-        pygame.display.flip()
-
+                render_queue.flush(target, (camera_x, 0), scale, below=render.HUD)
+                with profiler.section("upscale"):
+                    quality.upscale(target, screen)
+                frame_rects = render_queue.flush(screen, (camera_x, 0))
+
+        # The overlays are restored from room_background like any other dirty rect
+        for overlay_rect in (profiler.draw_overlay(screen), memory.draw_overlay(screen)):
+            if overlay_rect is not None:
+                frame_rects.append(overlay_rect)
+
+        with profiler.section("present"):
+            if inside_house and not full_redraw:
+                present(dirty_rects + frame_rects)
+            else:
+                present()
+        full_redraw = not inside_house
+        dirty_rects = frame_rects
+
+        if governor.add((time.perf_counter() - work_began) * 1000):
+            full_redraw = True
+            events.emit("quality", **governor.info())
+
+        memory.poll()
+        summary = frame_summary.add(frame.ms)
+        if summary is not None:
+            events.emit("frames", scene="house" if inside_house else "street", **summary)
+        if state.can_interact and not prev_can_interact:
+            events.emit("interact_prompt", scene="house" if inside_house else "street")
+        prev_can_interact = state.can_interact
+
+        if first_frame:
+            timings.mark("game_first_frame")
+            print(timings.summary())
+            events.emit("startup", phases=timings.report())
+            first_frame = False
+
+    input_source.close()
     pygame.quit()
 
 # --- Run game ---
-cutscene_text = [
-    "Ugh...those cars had me awake all night.",
-    "I'm hungry...might get pizza before I go to work."
+def dialogue(*lines):
+    # Each line types out, then waits for a key under a blinking prompt
+    steps = []
+    for line in lines:
+        steps.append(cutscene.Typewriter(line, (50, HEIGHT // 2), color=WHITE))
+        steps.append(cutscene.Prompt("Press Any Key to Continue", (50, HEIGHT // 2 + 40), color=WHITE))
+    return steps
+
+opening_cutscene = [
+    cutscene.Pause(1500, BLACK),
+    cutscene.Fade(BLACK, CUTSCENE_BG, 1400),
+    cutscene.Pause(1000),
+    *dialogue(
+        "Ugh...those cars had me awake all night.",
+        "I'm hungry...might get pizza before I go to work.",
+    ),
+    cutscene.Fade(CUTSCENE_BG, BLACK, 1400),
 ]
 
-run_cutscene(screen, clock, font, cutscene_text)
-main()
+JUMPSCARE_VIDEO = "jumpscare.mp4"
+
+def open_video(path):
+    # Opened and started ahead of play() so the first frame is ready
+    player = video.VideoPlayer(video.open_source(path, (WIDTH, HEIGHT)), (WIDTH, HEIGHT))
+    player.prepare()
+    return player
+
+
+# The jumpscare's raw frame cache is transcoded by a child process on first
+# run (see video.py); until it's there the video is decoded live
+if not args.headless:
+    video.build_raw_cache_in_background(JUMPSCARE_VIDEO, (WIDTH, HEIGHT))
+
+
+# --- Scenes ---
+# Each scene's assets are loaded in the background as the player nears the
+# way in (see scenes.py) and released once the scene is left behind. The
+# house is loaded during the opening cutscene; the street as the player
+# nears the door; the jumpscare as they near the Big Pizza entrance.
+# Budgets cover every tracked surface and array (see memory.py), the
+# window's own surface included; the street's is mostly the chunk cache.
+# What's prefetched for the next scene (its owners below) is reported as
+# warm instead, e.g. the jumpscare's decoder while the player is outside.
+# The player spawns about 208 px from the door, so the street only starts
+# loading once they head for it (about a second's walk out)
+HOUSE_EXIT_NEAR = 150
+HOUSE_BUDGET = 8 * memory.MB
+STREET_BUDGET = 24 * memory.MB
+JUMPSCARE_BUDGET = 24 * memory.MB
+def player_world_rect(state):
+    # Outside, the player stands at the middle of the screen
+    return pygame.Rect(state.camera_x + WIDTH // 2 - PLAYER_SIZE[0] // 2, state.player_y, *PLAYER_SIZE)
+
+loader = startup.Loader(timer=timings)
+scene_manager = scenes.SceneManager(loader, {
+    "player_sprites": scenes.Asset(player_animations.load, priority=0),
+    "fonts": scenes.Asset(lambda: [text.get_font(None, size) for size in (24, 28)], priority=1),
+    "room": scenes.Asset(lambda: scenery.build_room(house_level), priority=0),
+    "street": scenes.Asset(lambda: [street_chunks.get(i) for i in range(2)],
+                           release=lambda _chunks: street_chunks.invalidate(), priority=2),
+    "traffic": scenes.Asset(make_traffic, priority=2),
+    "jumpscare": scenes.Asset(lambda: open_video(JUMPSCARE_VIDEO), release=lambda player: player.close(), priority=3),
+}, [
+    scenes.Scene("opening"),
+    scenes.Scene("house", ["player_sprites", "fonts", "room"], [
+        scenes.Trigger("street", lambda state: scenes.rect_distance(
+            pygame.Rect(state.player_x, state.player_y, *PLAYER_SIZE), world.door_rect), near=HOUSE_EXIT_NEAR),
+    ], budget=HOUSE_BUDGET, owners=["room"]),
+    scenes.Scene("street", ["player_sprites", "fonts", "street", "traffic"], [
+        scenes.Trigger("jumpscare", lambda state: scenes.rect_distance(
+            player_world_rect(state), big_pizza_entrance), near=600),
+    ], budget=STREET_BUDGET, owners=["street_chunks", "entities", "traffic_sprites", "render_targets"]),
+    scenes.Scene("jumpscare", ["jumpscare"], budget=JUMPSCARE_BUDGET, owners=["video"]),
+])
+
+timings.mark("first_frame")
+try:
+    scene_manager.switch("opening")
+    scene_manager.prefetch("house")
+    with timings.phase("cutscene"):
+        run_cutscene(screen, input_source, font, opening_cutscene)
+    events.emit("scene", event="cutscene_done")
+    main()
+finally:
+    # Flushes a --record file, writes the profile and memory report and
+    # sends (or spools) the last telemetry however the game ends
+    input_source.close()
+    if args.profile:
+        profiler.export(args.profile, args.profile_format)
+    if args.memory:
+        memory.export(args.memory)
+    scene_manager.close()
+    events.emit("pacing", **pacer.info())
+    if not args.headless:
+        print(pacer.summary())
+    events.emit("session_end")
+    events.close()
@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import tracemalloc
+import warnings
+import weakref
+
+import pygame
+
+import overlays
+
+# --- Memory accounting ---
+# Code that creates a long-lived Surface registers it with track(owner, ...)
+# ("sprites", "text", "street_chunks", ...). Everything is held weakly, so a
+# surface drops out of the accounts as soon as it's freed. A Surface counts
+# w * h * bytes per pixel (subsurfaces share their parent's pixels and count
+# nothing); anything else is tracked with a size function, e.g. numpy arrays.
+#
+# The scene manager calls enter_scene() on every transition. The totals are
+# checked against the scene's budget there and whenever check() runs (poll()
+# runs it once a second), with one BudgetWarning per visit if it's exceeded. With
+# tracing on (start_tracing(), or main.py --memory) each transition also
+# takes a tracemalloc snapshot and records what grew since the last one.
+# Owners only holding assets prefetched for a scene not entered yet
+# (set_warm(), kept up to date by the scene manager) are reported as "warm"
+# and don't count against the current scene's budget.
+# tracemalloc only sees Python allocations, not SDL's pixel buffers, which is
+# what the surface accounts are for.
+TOP_ALLOCATIONS = 10
+CHECK_MS = 1000
+MB = 1024 * 1024
+
+overlay_visible = False
+_owners = {}  # owner -> WeakKeyDictionary(object -> bytes or size function)
+_lock = threading.Lock()
+_scene = None
+_scenes = {}  # name -> {"budget", "peak_bytes", "peak_warm_bytes", "visits"}
+_warm = frozenset()
+_transitions = []
+_snapshot = None
+_warned = False
+_checked = None
+_overlay = None  # overlays.TextPanel, made on first draw
+
+
+class BudgetWarning(UserWarning):
+    pass
+
+
+def surface_bytes(surface):
+    if surface.get_parent() is not None:
+        return 0
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def track(owner, obj, size=None):
+    # size: None for a Surface, a byte count, or a function of obj measured
+    # whenever a report is made. Returns obj.
+    if size is None:
+        size = surface_bytes(obj)
+    with _lock:
+        entries = _owners.get(owner)
+        if entries is None:
+            entries = _owners[owner] = weakref.WeakKeyDictionary()
+        entries[obj] = size
+    return obj
+
+
+def usage():
+    # {owner: {"objects": n, "bytes": total}}
+    with _lock:
+        owners = {owner: list(entries.items()) for owner, entries in _owners.items()}
+    result = {}
+    for owner, entries in owners.items():
+        total = sum(size(obj) if callable(size) else size for obj, size in entries)
+        result[owner] = {"objects": len(entries), "bytes": total}
+    return result
+
+
+def total_bytes(owners=None):
+    owners = usage() if owners is None else owners
+    return sum(entry["bytes"] for entry in owners.values())
+
+
+# --- Scenes and budgets ---
+def set_warm(owners):
+    global _warm
+    _warm = frozenset(owners)
+
+
+def warm_bytes(owners=None):
+    owners = usage() if owners is None else owners
+    return sum(entry["bytes"] for owner, entry in owners.items() if owner in _warm)
+
+
+def check():
+    # Updates the current scene's peaks and warns (once per visit) when it's
+    # over budget. Returns the bytes counted against the scene (all tracked
+    # bytes less the warm ones).
+    global _warned
+    owners = usage()
+    warm = warm_bytes(owners)
+    total = total_bytes(owners) - warm
+    scene = _scenes.get(_scene)
+    if scene is None:
+        return total
+    scene["peak_bytes"] = max(scene["peak_bytes"], total)
+    scene["peak_warm_bytes"] = max(scene["peak_warm_bytes"], warm)
+    budget = scene["budget"]
+    if budget is not None and total > budget and not _warned:
+        _warned = True
+        warnings.warn("scene %r holds %.1f MB of surfaces and arrays, over its %.1f MB budget"
+                      % (_scene, total / MB, budget / MB), BudgetWarning, stacklevel=2)
+    return total
+
+
+def poll():
+    # Cheap enough to call every frame; checks at most once per CHECK_MS
+    global _checked
+    now = pygame.time.get_ticks()
+    if _checked is None or now - _checked >= CHECK_MS:
+        _checked = now
+        check()
+
+
+def budget_exceeded():
+    scene = _scenes.get(_scene)
+    return scene is not None and scene["budget"] is not None and scene["peak_bytes"] > scene["budget"]
+
+
+def enter_scene(name, budget=None):
+    global _scene, _snapshot, _warned
+    transition = {"from": _scene, "to": name, "bytes": total_bytes()}
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot()
+        transition["traced_bytes"], transition["traced_peak"] = tracemalloc.get_traced_memory()
+        if _snapshot is not None:
+            transition["grew"] = [
+                {"where": str(stat.traceback[0]), "size_diff": stat.size_diff, "size": stat.size}
+                for stat in snapshot.compare_to(_snapshot, "lineno")[:TOP_ALLOCATIONS]
+            ]
+        _snapshot = snapshot
+    _transitions.append(transition)
+
+    scene = _scenes.setdefault(name, {"budget": budget, "peak_bytes": 0, "peak_warm_bytes": 0, "visits": 0})
+    scene["budget"] = budget
+    scene["visits"] += 1
+    _scene = name
+    _warned = False
+    check()
+
+
+def start_tracing(frames=1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def report():
+    owners = usage()
+    return {
+        "scene": _scene,
+        "total_bytes": total_bytes(owners),
+        "warm_bytes": warm_bytes(owners),
+        "warm_owners": sorted(_warm),
+        "owners": owners,
+        "scenes": {name: dict(scene) for name, scene in _scenes.items()},
+        "transitions": list(_transitions),
+    }
+
+
+def export(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report(), f, indent=1)
+
+
+# --- Overlay ---
+def toggle_overlay():
+    global overlay_visible
+    overlay_visible = not overlay_visible
+
+
+def draw_overlay(screen, pos=None):
+    # Drawn top right unless pos is given (the profiler's overlay is top
+    # left). Returns the rect drawn (for dirty-rect presentation), or None
+    global _overlay
+    if not overlay_visible:
+        return None
+    if _overlay is None:
+        _overlay = overlays.TextPanel((220, 230, 255))
+
+    if _overlay.due():
+        total = check()
+        scene = _scenes.get(_scene, {})
+        budget = scene.get("budget")
+        _overlay.lines = ["%-16s %8.2f MB" % (_scene or "-", total / MB)]
+        if budget is not None:
+            _overlay.lines.append("%-16s %8.2f MB" % ("budget", budget / MB))
+        if _warm:
+            _overlay.lines.append("%-16s %8.2f MB" % ("warm", warm_bytes() / MB))
+        rows = sorted(usage().items(), key=lambda item: -item[1]["bytes"])
+        _overlay.lines += ["%-16s %8.2f %4d" % (owner[:16], entry["bytes"] / MB, entry["objects"])
+                           for owner, entry in rows]
+    return _overlay.draw(screen, pos, (255, 140, 120) if budget_exceeded() else None)
@@ -0,0 +1,201 @@
+import threading
+
+import pygame
+
+import memory
+import startup
+
+np = startup.lazy_import("numpy")
+
+# --- Navigation ---
+# Scene collision rects are rasterized into a grid of blocked cells. For each
+# goal a flow field is computed once: a breadth-first wave from the goal gives
+# every free cell its distance to the goal, and each cell then points at its
+# closest neighbor. Any number of agents heading for the same goal just look
+# up the direction under them, so the cost is one field per goal rather than
+# one search per agent. Fields are cached until the geometry changes.
+CELL_SIZE = 16
+UNREACHABLE = 2 ** 31 - 1
+
+# Neighbor offsets (dx, dy); diagonals last
+OFFSETS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+class NavGrid:
+    def __init__(self, rects, bounds, cell_size=CELL_SIZE, clearance=(0, 0)):
+        # bounds: the walkable area as a rect. clearance grows every obstacle
+        # by an agent's size so agent centers keep off the walls.
+        self.bounds = pygame.Rect(bounds)
+        self.cell_size = cell_size
+        self.clearance = clearance
+        self.cols = -(-self.bounds.width // cell_size)
+        self.rows = -(-self.bounds.height // cell_size)
+        self.blocked = np.zeros((self.rows, self.cols), bool)
+        memory.track("navigation", self, lambda grid: grid.blocked.nbytes)
+        self.rects = []
+        self.add(rects)
+
+    def _cells(self, rect):
+        # Cell range (x0, y0, x1, y1), end exclusive, covered by rect
+        size = self.cell_size
+        x0 = max(0, (rect.left - self.bounds.x) // size)
+        y0 = max(0, (rect.top - self.bounds.y) // size)
+        x1 = min(self.cols, -(-(rect.right - self.bounds.x) // size))
+        y1 = min(self.rows, -(-(rect.bottom - self.bounds.y) // size))
+        return x0, y0, x1, y1
+
+    def add(self, rects):
+        for rect in rects:
+            rect = pygame.Rect(rect)
+            self.rects.append(rect)
+            x0, y0, x1, y1 = self._cells(rect.inflate(*self.clearance))
+            if x0 < x1 and y0 < y1:
+                self.blocked[y0:y1, x0:x1] = True
+
+    def cell(self, x, y):
+        # Cell (col, row) under a point; arrays in, arrays out
+        col = np.clip(((np.asarray(x) - self.bounds.x) // self.cell_size).astype(int), 0, self.cols - 1)
+        row = np.clip(((np.asarray(y) - self.bounds.y) // self.cell_size).astype(int), 0, self.rows - 1)
+        return col, row
+
+    def goal_cells(self, rect, max_grow=8):
+        # Free cells inside the goal rect. Goals are often drawn on or in an
+        # obstacle (a door in a wall), so the rect grows a cell at a time
+        # until it reaches free space.
+        rect = pygame.Rect(rect)
+        for _ in range(max_grow + 1):
+            x0, y0, x1, y1 = self._cells(rect)
+            mask = np.zeros((self.rows, self.cols), bool)
+            if x0 < x1 and y0 < y1:
+                mask[y0:y1, x0:x1] = True
+            mask &= ~self.blocked
+            if mask.any():
+                return mask
+            rect.inflate_ip(2 * self.cell_size, 2 * self.cell_size)
+        return mask
+
+
+def _shift(grid, dx, dy, fill):
+    # grid moved so out[r, c] = grid[r + dy, c + dx]
+    out = np.full_like(grid, fill)
+    rows, cols = grid.shape
+    out[max(0, -dy):rows - max(0, dy), max(0, -dx):cols - max(0, dx)] = \
+        grid[max(0, dy):rows - max(0, -dy), max(0, dx):cols - max(0, -dx)]
+    return out
+
+
+class FlowField:
+    def __init__(self, grid, goal):
+        self.grid = grid
+        self.goal = pygame.Rect(goal)
+        free = ~grid.blocked
+        target = grid.goal_cells(self.goal)
+
+        # Distance in steps from every free cell to the goal
+        distance = np.full(free.shape, UNREACHABLE, "int32")
+        distance[target] = 0
+        frontier = target
+        step = 0
+        while frontier.any():
+            step += 1
+            grown = np.zeros_like(frontier)
+            for dx, dy in OFFSETS[:4]:
+                grown |= _shift(frontier, dx, dy, False)
+            frontier = grown & free & (distance == UNREACHABLE)
+            distance[frontier] = step
+        self.distance = distance
+
+        # Each cell points at its closest neighbor. Diagonals only count when
+        # both cells beside them are free, so agents don't clip corners.
+        best = distance.copy()
+        direction = np.full(free.shape, -1, "int8")
+        for i, (dx, dy) in enumerate(OFFSETS):
+            neighbor = _shift(distance, dx, dy, UNREACHABLE)
+            if dx and dy:
+                open_x = _shift(free, dx, 0, False)
+                open_y = _shift(free, 0, dy, False)
+                neighbor = np.where(open_x & open_y, neighbor, UNREACHABLE)
+            closer = neighbor < best
+            best = np.where(closer, neighbor, best)
+            direction[closer] = i
+        direction[target] = -1
+        self.direction = direction
+        memory.track("navigation", self, lambda field: field.distance.nbytes + field.direction.nbytes)
+
+        vectors = np.array(OFFSETS + [(0, 0)], "float32")
+        vectors /= np.maximum(1, np.hypot(vectors[:, 0], vectors[:, 1]))[:, None]
+        self._vectors = vectors  # index -1 is the (0, 0) "stay" entry
+
+    def steer(self, x, y):
+        # Unit (dx, dy) towards the goal for points (arrays or scalars). Zero
+        # at the goal and wherever the goal can't be reached from.
+        col, row = self.grid.cell(x, y)
+        vectors = self._vectors[self.direction[row, col]]
+        return vectors[..., 0], vectors[..., 1]
+
+    def distance_at(self, x, y):
+        col, row = self.grid.cell(x, y)
+        return self.distance[row, col]
+
+    def reached(self, x, y):
+        return self.distance_at(x, y) == 0
+
+
+class FlowFields:
+    # One NavGrid per scene plus a field per goal, both built on first use
+    # (so numpy isn't imported before anything needs a path). set_geometry()
+    # with different rects throws the grid and fields away.
+    def __init__(self, rects, bounds, goals=None, cell_size=CELL_SIZE, clearance=(0, 0)):
+        self.bounds = bounds
+        self.cell_size = cell_size
+        self.clearance = clearance
+        self.goals = dict(goals or {})
+        self.stats = {"built": 0, "hits": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+        self._fields = {}
+        self._key = None
+        self._rects = []
+        self._grid = None
+        self.set_geometry(rects)
+
+    def set_geometry(self, rects):
+        rects = [pygame.Rect(rect) for rect in rects]
+        key = tuple(tuple(rect) for rect in rects)
+        with self._lock:
+            if key == self._key:
+                return False
+            if self._key is not None:
+                self.stats["invalidations"] += 1
+            self._key = key
+            self._rects = rects
+            self._grid = None
+            self._fields = {}
+            return True
+
+    @property
+    def grid(self):
+        with self._lock:
+            return self._grid_locked()
+
+    def _grid_locked(self):
+        if self._grid is None:
+            self._grid = NavGrid(self._rects, self.bounds, self.cell_size, self.clearance)
+        return self._grid
+
+    def field(self, goal):
+        # goal: a name from goals, or a rect
+        rect = pygame.Rect(self.goals[goal] if isinstance(goal, str) else goal)
+        key = tuple(rect)
+        with self._lock:
+            field = self._fields.get(key)
+            if field is not None:
+                self.stats["hits"] += 1
+                return field
+            field = FlowField(self._grid_locked(), rect)
+            self._fields[key] = field
+            self.stats["built"] += 1
+            return field
+
+    def cache_info(self):
+        with self._lock:
+            return {"fields": len(self._fields), **self.stats}
@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+
+import pygame
+
+import memory
+import text
+
+# --- Overlay pool ---
+# Translucent panels and shapes drawn over the scene (shadows, prompt
+# backgrounds, debug boxes, and the rects the render queue batches) are
+# baked once per (shape, size, color) and handed out again on later frames,
+# so steady-state frames allocate no Surfaces. Colors carry their alpha,
+# e.g. (0, 0, 0, 180). Callers only blit what they get back; a pooled surface
+# must never be drawn into.
+MAX_OVERLAYS = 64
+
+_pool = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+_lock = threading.Lock()
+
+
+def _get(shape, size, color, bake):
+    key = (shape, (int(size[0]), int(size[1])), tuple(color))
+    with _lock:
+        surface = _pool.get(key)
+        if surface is not None:
+            _pool.move_to_end(key)
+            _stats["hits"] += 1
+            return surface
+
+        _stats["misses"] += 1
+        surface = memory.track("overlays", pygame.Surface(key[1], pygame.SRCALPHA))
+        bake(surface, key[2])
+        _pool[key] = surface
+        _stats["bytes"] += surface.get_width() * surface.get_height() * surface.get_bytesize()
+        if len(_pool) > MAX_OVERLAYS:
+            _key, old = _pool.popitem(last=False)
+            _stats["bytes"] -= old.get_width() * old.get_height() * old.get_bytesize()
+            _stats["evictions"] += 1
+        return surface
+
+
+def panel(size, color):
+    # A rectangle of one (usually translucent) color
+    return _get("panel", size, color, lambda surface, color: surface.fill(color))
+
+
+def ellipse(size, color):
+    # An ellipse filling size, e.g. a shadow
+    return _get("ellipse", size, color,
+                lambda surface, color: pygame.draw.ellipse(surface, color, surface.get_rect()))
+
+
+def outline(size, color, width=1):
+    # The border of a rectangle, width pixels thick
+    return _get(("outline", width), size, color,
+                lambda surface, color: pygame.draw.rect(surface, color, surface.get_rect(), width))
+
+
+# --- Text panels ---
+# The debug overlays (profiler.py, memory.py) are a few lines of monospace
+# text on a translucent panel. Their lines are rebuilt at most every
+# refresh_ms: due() says when, and the caller then sets lines.
+TEXT_PANEL_REFRESH_MS = 500
+
+
+class TextPanel:
+    def __init__(self, color, refresh_ms=TEXT_PANEL_REFRESH_MS):
+        self.color = color
+        self.refresh_ms = refresh_ms
+        self.lines = []
+        self._updated = None
+        self._font = None
+
+    def due(self):
+        now = pygame.time.get_ticks()
+        if self._updated is None or now - self._updated >= self.refresh_ms:
+            self._updated = now
+            return True
+        return False
+
+    def draw(self, screen, pos=None, first_color=None):
+        # Drawn top right unless pos is given; first_color overrides the
+        # first line's color. Returns the rect drawn.
+        if self._font is None:
+            self._font = text.get_font("monospace", 14)
+        line_height = self._font.get_linesize()
+        width = max(self._font.size(line)[0] for line in self.lines) + 12
+        height = line_height * len(self.lines) + 8
+        if pos is None:
+            pos = (screen.get_width() - width - 8, 8)
+        rect = screen.blit(panel((width, height), (0, 0, 0, 170)), pos)
+        for row, line in enumerate(self.lines):
+            color = first_color if first_color and row == 0 else self.color
+            screen.blit(text.render(self._font, line, color), (pos[0] + 6, pos[1] + 4 + row * line_height))
+        return rect
+
+
+def cache_info():
+    with _lock:
+        return {
+            "overlays": len(_pool),
+            "max_overlays": MAX_OVERLAYS,
+            **_stats,
+        }
+
+
+def clear():
+    with _lock:
+        _pool.clear()
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,72 @@
+import time
+
+# --- Frame pacing ---
+# While nothing on screen is changing (the player standing still in the room,
+# a cutscene holding on a line of text) there's no point drawing 60+ frames a
+# second. Each frame the loop tells the Pacer how long the screen will stay
+# as it is unless input arrives: 0 while something is moving, a number of ms
+# for a timer (the next blink of a prompt), or None if nothing is scheduled.
+# After IDLE_FRAMES quiet frames in a row, wait_ms is set and the loop passes
+# it to input_source.next_frame, which blocks in pygame.event.wait until an
+# event comes in or the time is up (see inputs.py); the loop also skips
+# drawing frames it knows are unchanged. Any input or movement puts it back
+# to the full frame rate on the next frame.
+#
+# Wall and CPU time are accounted to busy and idle frames separately; info()
+# estimates the CPU saved as what the idle time would have cost at the busy
+# frames' CPU rate, less what it actually cost.
+IDLE_FRAMES = 3
+MAX_WAIT_MS = 500  # wake at least this often, for the loader and telemetry
+
+
+class Pacer:
+    def __init__(self, frame_ms, idle_frames=IDLE_FRAMES, max_wait_ms=MAX_WAIT_MS):
+        self.frame_ms = frame_ms
+        self.idle_frames = idle_frames
+        self.max_wait_ms = max_wait_ms
+        self.wait_ms = None  # for the next frame; None runs at the full rate
+        self.stats = {"busy_frames": 0, "idle_frames": 0, "busy_ms": 0.0, "idle_ms": 0.0,
+                      "busy_cpu_ms": 0.0, "idle_cpu_ms": 0.0}
+        self._quiet = 0
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    @property
+    def idle(self):
+        return self.wait_ms is not None
+
+    def update(self, quiet_ms):
+        # Call once per frame. The time since the last call goes to the kind
+        # of frame the last call chose.
+        wall, cpu = time.perf_counter(), time.process_time()
+        kind = "idle" if self.idle else "busy"
+        self.stats[kind + "_frames"] += 1
+        self.stats[kind + "_ms"] += (wall - self._wall) * 1000
+        self.stats[kind + "_cpu_ms"] += (cpu - self._cpu) * 1000
+        self._wall, self._cpu = wall, cpu
+
+        if quiet_ms == 0:
+            self._quiet = 0
+            self.wait_ms = None
+            return
+        self._quiet += 1
+        wait = self.max_wait_ms if quiet_ms is None else min(quiet_ms, self.max_wait_ms)
+        # Not worth it for a timer due within a couple of frames
+        if self._quiet >= self.idle_frames and wait >= 2 * self.frame_ms:
+            self.wait_ms = int(wait)
+        else:
+            self.wait_ms = None
+
+    def info(self):
+        stats = self.stats
+        busy_rate = stats["busy_cpu_ms"] / stats["busy_ms"] if stats["busy_ms"] else 0.0
+        saved = max(0.0, stats["idle_ms"] * busy_rate - stats["idle_cpu_ms"])
+        return {**{key: round(value, 1) for key, value in stats.items()},
+                "cpu_saved_ms": round(saved, 1)}
+
+    def summary(self):
+        info = self.info()
+        total = info["busy_ms"] + info["idle_ms"]
+        return ("frame pacing: idle %.0f%% of %.1f s, %d idle frames, ~%.1f s CPU saved"
+                % (100 * info["idle_ms"] / total if total else 0, total / 1000,
+                   info["idle_frames"], info["cpu_saved_ms"] / 1000))
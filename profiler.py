@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+from array import array
+
+import overlays
+
+# --- Frame profiler ---
+# Named sections are timed with perf_counter_ns into fixed-size ring buffers
+# (the last RING_SIZE samples per section). While disabled, section() hands
+# back one shared do-nothing context manager, so instrumented code pays for a
+# function call and nothing else.
+#
+#     with profiler.section("collision"):
+#         ...
+#
+# frame() marks the start of each frame and records the whole frame time as
+# the "frame" section. Stats are p50/p95/p99 in milliseconds.
+RING_SIZE = 600
+
+enabled = False
+overlay_visible = False
+_rings = {}
+_epoch_ns = time.perf_counter_ns()
+_last_frame_ns = None
+
+
+class Ring:
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self.starts = array("q", bytes(8 * size))
+        self.durations = array("q", bytes(8 * size))
+        self.threads = array("q", bytes(8 * size))
+        self.index = 0
+        self.count = 0
+
+    def add(self, start_ns, duration_ns, thread_id=0):
+        i = self.index
+        self.starts[i] = start_ns
+        self.durations[i] = duration_ns
+        self.threads[i] = thread_id
+        self.index = (i + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def samples(self):
+        # (start_ns, duration_ns, thread) oldest first
+        first = (self.index - self.count) % self.size
+        order = [(first + n) % self.size for n in range(self.count)]
+        return [(self.starts[i], self.durations[i], self.threads[i]) for i in order]
+
+
+def _ring(name):
+    ring = _rings.get(name)
+    if ring is None:
+        ring = _rings.setdefault(name, Ring())
+    return ring
+
+
+class _Section:
+    __slots__ = ("ring", "start")
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        now = time.perf_counter_ns()
+        self.ring.add(self.start, now - self.start, threading.get_ident())
+        return False
+
+
+class _NullSection:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSection()
+
+
+def section(name):
+    if not enabled:
+        return _NULL
+    return _Section(_ring(name))
+
+
+def frame():
+    global _last_frame_ns
+    if not enabled:
+        return
+    now = time.perf_counter_ns()
+    if _last_frame_ns is not None:
+        _ring("frame").add(_last_frame_ns, now - _last_frame_ns, threading.get_ident())
+    _last_frame_ns = now
+
+
+def enable(flag=True):
+    global enabled, _last_frame_ns
+    enabled = flag
+    _last_frame_ns = None
+
+
+def reset():
+    _rings.clear()
+
+
+# --- Stats ---
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * (len(values) - 1) + 0.5))]
+
+
+def stats():
+    # {section: {"count", "p50", "p95", "p99", "max"}} in milliseconds
+    result = {}
+    for name, ring in list(_rings.items()):
+        if not ring.count:
+            continue
+        # Until the ring wraps, the samples are the first count slots
+        values = [v / 1e6 for v in sorted(ring.durations[:ring.count])]
+        result[name] = {
+            "count": ring.count,
+            "p50": round(_percentile(values, 0.50), 3),
+            "p95": round(_percentile(values, 0.95), 3),
+            "p99": round(_percentile(values, 0.99), 3),
+            "max": round(values[-1], 3),
+        }
+    return result
+
+
+# --- Export ---
+def export_json(path):
+    data = {
+        "stats": stats(),
+        "samples": {
+            name: [[(start - _epoch_ns) / 1e6, duration / 1e6] for start, duration, _t in ring.samples()]
+            for name, ring in _rings.items()
+        },
+    }
+    _write(path, data)
+
+
+def export_chrome_trace(path):
+    # Loads in chrome://tracing or Perfetto as complete ("X") events
+    events = []
+    for name, ring in _rings.items():
+        for start, duration, thread in ring.samples():
+            events.append({
+                "name": name, "ph": "X", "pid": os.getpid(), "tid": thread,
+                "ts": (start - _epoch_ns) / 1000, "dur": duration / 1000,
+            })
+    events.sort(key=lambda event: event["ts"])
+    _write(path, {"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+def export(path, fmt="json"):
+    if fmt == "chrome":
+        export_chrome_trace(path)
+    else:
+        export_json(path)
+
+
+def _write(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+# --- Overlay ---
+_overlay = None  # overlays.TextPanel, made on first draw
+
+
+def toggle_overlay():
+    global overlay_visible
+    overlay_visible = not overlay_visible
+
+
+def draw_overlay(screen, pos=(8, 8)):
+    # Returns the rect drawn (for dirty-rect presentation), or None
+    global _overlay
+    if not (enabled and overlay_visible):
+        return None
+    if _overlay is None:
+        _overlay = overlays.TextPanel((220, 255, 220))
+
+    # Re-sorting the rings every frame would show up in the profile itself
+    if _overlay.due():
+        rows = sorted(stats().items(), key=lambda item: -item[1]["p50"])
+        _overlay.lines = ["%-16s %6s %6s %6s" % ("ms", "p50", "p95", "p99")]
+        _overlay.lines += ["%-16s %6.2f %6.2f %6.2f" % (name[:16], s["p50"], s["p95"], s["p99"]) for name, s in rows]
+    return _overlay.draw(screen, pos)
@@ -0,0 +1,128 @@
+from collections import deque, namedtuple
+
+import pygame
+
+import memory
+
+# --- Render quality ---
+# A level sets the scale of the internal render target (the street is drawn
+# into it and scaled up to the window once per frame) and which optional
+# effects are drawn. Under "auto" the Governor averages how long frames take
+# to build (update, draw and present, not the wait for the next frame) over
+# a sliding window: over budget it steps down a level, well under it steps
+# back up. A step down that doesn't make frames cheaper (scaling has a cost
+# of its own) is undone, and the governor doesn't go below that level again.
+#
+# Only halving pays for its upscale here: in bench.py's street_frame cases a
+# 0.5 target beats full resolution, while 0.6 to 0.8 cost 1.5x as much. So
+# "low" sheds effects at full resolution and only "lowest" is scaled.
+Level = namedtuple("Level", "name scale shadows overlays debug")
+
+LEVELS = [
+    Level("high", 1.0, shadows=True, overlays=True, debug=True),
+    Level("medium", 1.0, shadows=True, overlays=True, debug=False),
+    Level("low", 1.0, shadows=False, overlays=False, debug=False),
+    Level("lowest", 0.5, shadows=False, overlays=False, debug=False),
+]
+
+WINDOW = 60  # frames averaged
+UPGRADE_RATIO = 0.6  # step up once frames take less than this much of the budget
+NO_GAIN = 0.95  # a step down must cut the average below this much of what it was
+MAX_UPGRADE_WAIT = 30 * WINDOW
+
+
+def level_named(name):
+    for index, level in enumerate(LEVELS):
+        if level.name == name:
+            return index
+    raise ValueError("no quality level %r" % name)
+
+
+class Governor:
+    def __init__(self, budget_ms, auto=True, start=0, levels=LEVELS, window=WINDOW):
+        self.budget_ms = budget_ms
+        self.auto = auto
+        self.levels = levels
+        self.index = start
+        self.floor = len(levels) - 1  # lowest level worth going to
+        self.samples = deque(maxlen=window)
+        self.stats = {"downgrades": 0, "upgrades": 0, "undone": 0}
+        self._frames = 0  # since the last change
+        self._upgrade_wait = 2 * window
+        self._check = None  # (level, average) before the last step down
+        self._stepped_up = False
+
+    @property
+    def level(self):
+        return self.levels[self.index]
+
+    def average_ms(self):
+        return sum(self.samples) / len(self.samples) if self.samples else 0.0
+
+    def _set(self, index):
+        self.index = index
+        self.samples.clear()
+        self._frames = 0
+
+    def add(self, work_ms):
+        # Returns True when the level changed
+        if not self.auto:
+            return False
+        self.samples.append(work_ms)
+        self._frames += 1
+        if len(self.samples) < self.samples.maxlen:
+            return False
+        average = self.average_ms()
+
+        if self._check is not None:
+            before_index, before = self._check
+            self._check = None
+            if average >= before * NO_GAIN:
+                self.floor = before_index
+                self.stats["undone"] += 1
+                self._set(before_index)
+                return True
+
+        if average > self.budget_ms and self.index < self.floor:
+            if self._stepped_up and self._frames < self._upgrade_wait:
+                # Went back over budget soon after stepping up: wait longer
+                # before trying that again
+                self._upgrade_wait = min(2 * self._upgrade_wait, MAX_UPGRADE_WAIT)
+            self._check = (self.index, average)
+            self._stepped_up = False
+            self.stats["downgrades"] += 1
+            self._set(self.index + 1)
+            return True
+        if (average < self.budget_ms * UPGRADE_RATIO and self.index > 0
+                and self._frames >= self._upgrade_wait):
+            self.stats["upgrades"] += 1
+            self._stepped_up = True
+            self._set(self.index - 1)
+            return True
+        return False
+
+    def info(self):
+        return {"level": self.level.name, "average_ms": round(self.average_ms(), 2),
+                "budget_ms": round(self.budget_ms, 2), **self.stats}
+
+
+# --- Render targets ---
+_targets = {}
+
+
+def render_target(screen, scale):
+    # The surface to draw a frame into: the screen itself at full scale,
+    # otherwise a smaller surface kept for the next frame
+    if scale == 1.0:
+        return screen
+    width, height = screen.get_size()
+    size = (round(width * scale), round(height * scale))
+    target = _targets.get(size)
+    if target is None:
+        target = _targets[size] = memory.track("render_targets", pygame.Surface(size).convert())
+    return target
+
+
+def upscale(target, screen):
+    if target is not screen:
+        pygame.transform.scale(target, screen.get_size(), screen)
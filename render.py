@@ -0,0 +1,112 @@
+import weakref
+
+import pygame
+
+import memory
+import overlays
+
+# --- Render queue ---
+# Scenes submit what they want drawn for the frame instead of drawing it
+# straight away. flush() drops whatever is outside the camera, sorts the rest
+# once by (layer, sort_y) and draws everything with a single Surface.blits()
+# call. Within a layer, things lower on screen (larger sort_y, by default the
+# bottom edge) are drawn over things above them.
+#
+# Positions are world coordinates unless screen_space is set (HUD, prompts);
+# screen-space items without a sort_y keep the order they were submitted in.
+# Filled and outlined rects are turned into pooled surfaces (overlays.py) so
+# they batch with the sprites.
+#
+# flush() can also draw into a smaller render target (see quality.py). Every
+# position is then scaled, and each sprite is scaled once per scale and kept
+# for as long as the original surface lives.
+BACKGROUND = 0
+WORLD = 1
+HUD = 2
+
+_scaled = weakref.WeakKeyDictionary()  # surface -> {scale: scaled surface}
+
+
+def scaled(surface, scale):
+    versions = _scaled.get(surface)
+    if versions is None:
+        versions = _scaled[surface] = {}
+    result = versions.get(scale)
+    if result is None:
+        width, height = surface.get_size()
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if surface.get_bitsize() >= 24:
+            result = pygame.transform.smoothscale(surface, size)
+        else:
+            result = pygame.transform.scale(surface, size)
+        versions[scale] = memory.track("scaled_sprites", result)
+    return result
+
+
+class RenderQueue:
+    def __init__(self):
+        self.items = []
+        self.stats = {"submitted": 0, "culled": 0, "drawn": 0}
+
+    def __len__(self):
+        return len(self.items)
+
+    def sprite(self, surface, pos, layer=WORLD, sort_y=None, area=None, screen_space=False):
+        if area is not None:
+            area = pygame.Rect(area)
+            width, height = area.size
+        else:
+            width, height = surface.get_size()
+        if sort_y is None:
+            sort_y = 0 if screen_space else pos[1] + height
+        # (sort key, surface, x, y, w, h, area, screen_space); len(items) keeps
+        # equal keys in submission order
+        self.items.append(((layer, sort_y, len(self.items)), surface, pos[0], pos[1], width, height, area, screen_space))
+
+    def fill(self, color, rect, layer=WORLD, sort_y=None, screen_space=False):
+        rect = pygame.Rect(rect)
+        self.sprite(overlays.panel(rect.size, color), rect.topleft, layer, sort_y, screen_space=screen_space)
+
+    def outline(self, color, rect, width=1, layer=WORLD, sort_y=None, screen_space=False):
+        rect = pygame.Rect(rect)
+        self.sprite(overlays.outline(rect.size, color, width), rect.topleft, layer, sort_y, screen_space=screen_space)
+
+    def clear(self):
+        self.items.clear()
+
+    def flush(self, screen, camera=(0, 0), scale=1.0, below=None):
+        # Draws and clears the queue; returns the rects drawn, in draw order.
+        # screen is drawn to at scale. With below, only the layers under it
+        # are drawn and the rest stay queued for the next flush.
+        camera_x, camera_y = camera
+        view_w, view_h = screen.get_size()
+        view_w /= scale
+        view_h /= scale
+        items = self.items
+        kept = []
+        if below is not None:
+            kept = [item for item in items if item[0][0] >= below]
+            items = [item for item in items if item[0][0] < below]
+        batch = []
+        culled = 0
+        for key, surface, x, y, width, height, area, screen_space in sorted(items, key=lambda item: item[0]):
+            if not screen_space:
+                x -= camera_x
+                y -= camera_y
+            if x + width <= 0 or y + height <= 0 or x >= view_w or y >= view_h:
+                culled += 1
+                continue
+            if scale != 1.0:
+                surface = scaled(surface, scale)
+                x *= scale
+                y *= scale
+                if area is not None:
+                    area = pygame.Rect(round(area.x * scale), round(area.y * scale),
+                                       round(area.width * scale), round(area.height * scale))
+            batch.append((surface, (x, y), area) if area is not None else (surface, (x, y)))
+
+        self.stats["submitted"] += len(items)
+        self.stats["culled"] += culled
+        self.stats["drawn"] += len(batch)
+        self.items = kept
+        return screen.blits(batch) if batch else []
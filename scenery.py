@@ -0,0 +1,107 @@
+import pygame
+
+import memory
+import overlays
+import text
+from settings import WIDTH, HEIGHT, BG_COLOR, WALL_COLOR
+
+# --- Scenery ---
+# The static backdrops: the room, drawn once per run, and the street, drawn
+# a strip at a time for the chunk cache (see chunks.py). They live here
+# rather than in main.py so tools like bench.py can draw them without
+# starting the game.
+
+
+def build_room(house_level):
+    # The whole room, drawn once; frames blit it or parts of it
+    surface = memory.track("room", pygame.Surface((WIDTH, HEIGHT)).convert())
+    surface.fill(house_level.properties.get("background", BG_COLOR))  # background outside room
+
+    # Object groups are drawn in map order: floor, furniture/walls, doors
+    for obj in house_level.objects:
+        pygame.draw.rect(surface, obj.properties.get("color", WALL_COLOR), obj.rect)
+
+    return surface
+
+
+def render_street_chunk(screen, camera_x, pizza_building_entrance):
+    # Draws the strip of street whose left edge is at world x = camera_x
+    width = screen.get_width()
+    screen.fill((135, 206, 235))  # Light sky blue background
+
+    # Draw ground
+    ground_rect = pygame.Rect(0, HEIGHT // 2, width, HEIGHT // 2)
+    pygame.draw.rect(screen, (50, 50, 50), ground_rect)  # street
+
+    # Sidewalk border lines
+    border_thickness = 8
+    border_color = (220, 220, 220)
+    pygame.draw.rect(screen, border_color, pygame.Rect(0, HEIGHT//2 - border_thickness, width, border_thickness))
+    pygame.draw.rect(screen, border_color, pygame.Rect(0, HEIGHT - border_thickness, width, border_thickness))
+
+    # Repeating buildings based on camera_x
+    building_width = 100
+    building_height = 150
+    spacing = 150
+
+    for i in range(-1, width // spacing + 2):
+        x = i * spacing - (camera_x % spacing)
+        world_x = camera_x + x
+
+        building_rect = pygame.Rect(x, HEIGHT//2 - building_height, building_width, building_height)
+
+        if world_x < 2000:
+            pygame.draw.rect(screen, (70, 70, 90), building_rect)
+        else:
+            # Pizza shop
+            pygame.draw.rect(screen, (200, 80, 30), building_rect)
+
+            # Special red sign above one enterable pizza shop at x = 2600
+            if world_x == 2600:
+                sign_rect = pygame.Rect(x + building_width // 2 - 10, HEIGHT//2 - building_height - 20, 20, 20)
+                pygame.draw.rect(screen, (255, 0, 0), sign_rect)
+
+            pygame.draw.rect(screen, (255, 255, 0), pygame.Rect(x + 20, HEIGHT//2 - 120, 60, 30))  # pizza sign background
+            label = text.render_sys("Pizza", 24, (0, 0, 0))
+            screen.blit(label, (x + 30, HEIGHT//2 - 115))
+    
+    # Special enterable pizza building at the end
+    entrance_screen_x = pizza_building_entrance.x - camera_x
+    if -pizza_building_entrance.width < entrance_screen_x <= width:
+        pygame.draw.rect(screen, (220, 50, 50), pygame.Rect(entrance_screen_x, pizza_building_entrance.y, pizza_building_entrance.width, pizza_building_entrance.height))
+        pygame.draw.rect(screen, (255, 255, 0), pygame.Rect(entrance_screen_x + 20, pizza_building_entrance.y + 20, 60, 30))  # pizza sign
+        label = text.render_sys("Pizza", 28, (0, 0, 0))
+        screen.blit(label, (entrance_screen_x + 25, pizza_building_entrance.y + 25))
+
+        # --- Draw final pizza building at the end of the street ---
+    final_pizza_world_x = 4500
+    final_pizza_screen_x = final_pizza_world_x - camera_x
+    final_pizza_screen_y = HEIGHT // 2 - 80
+    final_pizza_width = 120
+    final_pizza_height = 200
+
+    # Draw building (different color so it stands out)
+    pygame.draw.rect(screen, (255, 255, 0), (final_pizza_screen_x, final_pizza_screen_y, final_pizza_width, final_pizza_height))
+
+    # Draw door
+    pygame.draw.rect(screen, (100, 100, 100), (final_pizza_screen_x + 30, final_pizza_screen_y + 140, 60, 60))
+
+    # Label on building
+    label = text.render_sys("Big Pizza", 24, (0, 0, 0))
+    screen.blit(label, (final_pizza_screen_x + 10, final_pizza_screen_y + 10))
+
+        # --- Draw barrier at end of road before Big Pizza ---
+    barrier_world_x = 4450
+    barrier_screen_x = barrier_world_x - camera_x
+    barrier_y = HEIGHT // 2 - 20
+    barrier_width = 10
+    barrier_height = 200
+
+    # Draw a vertical black barrier
+    pygame.draw.rect(screen, (0, 0, 0), (barrier_screen_x, barrier_y, barrier_width, barrier_height))
+
+        # Darken road beyond the barrier to make it look closed
+    road_overlay_rect = pygame.Rect(barrier_screen_x + barrier_width, barrier_y, WIDTH, barrier_height)
+    if road_overlay_rect.right > 0 and road_overlay_rect.left < width:
+        dark_overlay = overlays.panel(road_overlay_rect.size, (0, 0, 0, 150))  # Semi-transparent black
+        screen.blit(dark_overlay, (barrier_screen_x + barrier_width, barrier_y))
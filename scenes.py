@@ -0,0 +1,206 @@
+import threading
+import time
+
+import memory
+
+# --- Scenes ---
+# A scene (the opening cutscene, the house, the street, the jumpscare video)
+# names the assets it needs and the triggers that lead out of it. Assets are
+# loader jobs (see startup.Loader). Every frame update() measures how far the
+# player is from each trigger of the current scene: once within `near`, the
+# target scene's assets start loading in the background, and if the player
+# walks back past `far` they're released again. By the time the player
+# actually goes through, switch() usually finds everything loaded, and it then
+# releases whatever the scene being left needed that the new one doesn't.
+#
+# The scenes form a stack: push() puts a scene over the current one and keeps
+# the assets of everything under it, switch() replaces the current scene.
+# A scene may also declare a memory budget in bytes, checked by memory.py on
+# every transition, and the memory owners its assets are tracked under
+# (memory.track), so assets prefetched for a scene not entered yet are
+# reported as warm rather than against the current scene.
+
+
+class Asset:
+    # load() builds the asset (on a loader thread); release(value), if given,
+    # frees it again, e.g. closes a file or a decoder
+    def __init__(self, load, release=None, priority=10):
+        self.load = load
+        self.release = release
+        self.priority = priority
+
+
+class Trigger:
+    # distance(state) -> pixels between the player and the way into scene
+    def __init__(self, scene, distance, near, far=None):
+        self.scene = scene
+        self.distance = distance
+        self.near = near
+        self.far = near * 1.5 if far is None else far
+
+
+class Scene:
+    def __init__(self, name, assets=(), triggers=(), budget=None, owners=()):
+        self.name = name
+        self.assets = tuple(assets)
+        self.triggers = tuple(triggers)
+        self.budget = budget
+        self.owners = tuple(owners)
+
+
+def rect_distance(a, b):
+    # Gap between two rects, 0 when they touch or overlap
+    dx = max(b.left - a.right, a.left - b.right, 0)
+    dy = max(b.top - a.bottom, a.top - b.bottom, 0)
+    return (dx * dx + dy * dy) ** 0.5
+
+
+def _release_done(future, release):
+    if not future.cancelled() and future.exception() is None:
+        release(future.result())
+
+
+class SceneManager:
+    def __init__(self, loader, assets, scenes=()):
+        self.loader = loader
+        self.assets = dict(assets)
+        self.scenes = {}
+        self.stack = []
+        self.warm = set()  # scenes prefetched by a trigger but not entered
+        self.stats = {"prefetched": 0, "cooled": 0, "released": 0, "entered": 0, "stalls": 0, "wait_ms": 0.0}
+        self._loaded = set()  # asset names submitted to the loader
+        self._lock = threading.Lock()
+        for scene in scenes:
+            self.add(scene)
+
+    def add(self, scene):
+        self.scenes[scene.name] = scene
+
+    @property
+    def current(self):
+        return self.stack[-1] if self.stack else None
+
+    # --- Loading and releasing ---
+    def prefetch(self, name):
+        # Starts loading a scene's assets in the background
+        with self._lock:
+            if name in self.warm or name in self.stack:
+                return
+            self.warm.add(name)
+            self.stats["prefetched"] += 1
+            self._submit(self.scenes[name].assets)
+            self._update_warm()
+
+    def _submit(self, names):
+        # Caller holds the lock
+        for name in names:
+            asset = self.assets[name]
+            self.loader.submit(name, asset.load, asset.priority)
+            self._loaded.add(name)
+
+    def cool(self, name):
+        # Drops a prefetched scene that the player turned away from
+        with self._lock:
+            if name not in self.warm:
+                return
+            self.warm.discard(name)
+            self.stats["cooled"] += 1
+            self._release_unused()
+
+    def _update_warm(self):
+        # Caller holds the lock
+        warm = set()
+        for name in self.warm:
+            warm.update(self.scenes[name].owners)
+        for name in self.stack:
+            warm.difference_update(self.scenes[name].owners)
+        memory.set_warm(warm)
+
+    def _release_unused(self):
+        # Caller holds the lock. Releases every loaded asset that no scene on
+        # the stack or being prefetched needs.
+        self._update_warm()
+        needed = set()
+        for name in self.stack + list(self.warm):
+            needed.update(self.scenes[name].assets)
+        for name in self._loaded - needed:
+            self._loaded.discard(name)
+            future = self.loader.discard(name)
+            release = self.assets[name].release
+            if future is not None and release is not None:
+                # A job still running is released once it finishes
+                future.add_done_callback(lambda done, release=release: _release_done(done, release))
+            self.stats["released"] += 1
+
+    def _enter(self, name):
+        # Caller holds the lock. Waits for (or loads) whatever the scene
+        # needs that isn't ready yet and returns {asset name: value}.
+        scene = self.scenes[name]
+        self.warm.discard(name)
+        self._update_warm()
+        self._submit(scene.assets)
+        began = time.perf_counter()
+        if not all(self.loader.ready(asset) for asset in scene.assets):
+            self.stats["stalls"] += 1
+        values = {asset: self.loader.get(asset) for asset in scene.assets}
+        self.stats["wait_ms"] += (time.perf_counter() - began) * 1000
+        self.stats["entered"] += 1
+        return values
+
+    # --- Stack ---
+    def push(self, name):
+        with self._lock:
+            self.stack.append(name)
+            values = self._enter(name)
+        memory.enter_scene(name, self.scenes[name].budget)
+        return values
+
+    def switch(self, name):
+        # Replaces the current scene; the old scene's assets are released
+        # once the new scene's are in hand
+        with self._lock:
+            if self.stack:
+                self.stack[-1] = name
+            else:
+                self.stack.append(name)
+            values = self._enter(name)
+            self.warm.clear()
+            self._release_unused()
+        memory.enter_scene(name, self.scenes[name].budget)
+        return values
+
+    def pop(self):
+        with self._lock:
+            self.stack.pop()
+            self.warm.clear()
+            self._release_unused()
+            if not self.stack:
+                return {}
+            name = self.stack[-1]
+            values = self._enter(name)
+        memory.enter_scene(name, self.scenes[name].budget)
+        return values
+
+    def update(self, state):
+        # Prefetches or cools the scenes the current one leads to, by how
+        # close the player is to each trigger
+        scene = self.scenes.get(self.current)
+        if scene is None:
+            return
+        for trigger in scene.triggers:
+            distance = trigger.distance(state)
+            if distance <= trigger.near:
+                self.prefetch(trigger.scene)
+            elif distance > trigger.far:
+                self.cool(trigger.scene)
+
+    def close(self):
+        # Releases everything, e.g. on exit
+        with self._lock:
+            self.stack = []
+            self.warm.clear()
+            self._release_unused()
+
+    def cache_info(self):
+        with self._lock:
+            return {"scene": self.current, "warm": sorted(self.warm), "assets": sorted(self._loaded), **self.stats}
@@ -0,0 +1,12 @@
+# --- Settings ---
+WIDTH, HEIGHT = 800, 600
+FPS = 60  # Simulation steps per second (see game.py / loop.py)
+MAX_RENDER_FPS = 120  # Rendering cap; 0 renders as fast as the machine allows
+MAX_CATCHUP_STEPS = 5  # Most simulation steps run for one slow frame
+FRAME_BUDGET_MS = 1000 / FPS  # What --quality auto keeps frame build time under
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+BG_COLOR = (245, 235, 220)  # Light tan
+WALL_COLOR = (80, 60, 50)
+PLAYER_SIZE = (32, 45)
+PLAYER_SPEED = 2.3  # Pixels per simulation step
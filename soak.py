@@ -0,0 +1,296 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import pygame
+
+import game
+import inputs
+from settings import PLAYER_SIZE
+
+# --- Soak / fuzz runner ---
+# Runs the simulation (game.step, no display) in a pool of worker processes
+# for as many steps as asked, driven by random input, by a player that
+# follows the flow fields to the door and down the street, or by a recorded
+# input file with random keys flipped. Work is handed out in chunks of
+# CHUNK_STEPS; each chunk is a fresh game with its own seed, so anything it
+# finds can be reproduced with --seed and --chunk. Workers send back only
+# aggregates (counters, a step-time histogram, a few examples) through the
+# pool's pipes, and the parent merges them as they arrive.
+#
+#     python soak.py --steps 5000000
+#     python soak.py --policy script --script walk.inp --workers 4
+#
+# A player is "trapped" when every move that should move them is rolled back
+# by collision (checked after PIN_STEPS steps of trying to move and going
+# nowhere), and "inside" when they are found overlapping scene geometry.
+# Step times are only meaningful with no more workers than cores; beyond
+# that, steps that straddle a context switch show up as slow_step.
+CHUNK_STEPS = 100_000
+EPISODE_STEPS = 20_000  # steps before starting over if nothing else ends the game
+PIN_STEPS = 60
+SLOW_STEP_NS = 2_000_000
+MAX_EXAMPLES = 20  # per kind, so slow steps can't crowd out the collision problems
+KINDS = ("trapped", "inside", "slow_step")  # order examples are reported in
+BUCKETS = 26  # step-time histogram; bucket b holds steps under 2 ** (b + 10) ns
+
+MOVES = [
+    game.Input(True, False, False, False, False, False),
+    game.Input(False, True, False, False, False, False),
+    game.Input(False, False, True, False, False, False),
+    game.Input(False, False, False, True, False, False),
+]
+
+
+# --- Input policies ---
+# policy(rng, state, world) -> Input for the next step
+def random_policy():
+    held = [game.NO_INPUT, 0]
+
+    def next_input(rng, state, world):
+        if held[1] <= 0:
+            keys = [rng.random() < 0.35 for _ in range(4)] + [rng.random() < 0.15, False]
+            held[0] = game.Input(*keys)
+            held[1] = rng.randint(5, 90)
+        held[1] -= 1
+        return held[0]
+    return next_input
+
+
+def seek_policy(explore=0.2):
+    # Heads for the door, then walks the street towards the Big Pizza,
+    # pressing E whenever there's something to interact with. Now and then
+    # it takes a random detour.
+    wander = random_policy()
+    detour = [0]
+
+    def next_input(rng, state, world):
+        if detour[0] > 0 or rng.random() < explore / 60:
+            detour[0] = detour[0] - 1 if detour[0] > 0 else rng.randint(20, 120)
+            return wander(rng, state, world)
+        interact = state.can_interact and not state.e_pressed
+        if state.inside_house:
+            dx, dy = world.house_nav.field("door").steer(state.player_x + PLAYER_SIZE[0] / 2,
+                                                          state.player_y + PLAYER_SIZE[1] / 2)
+            return game.Input(dy < -0.3, dy > 0.3, dx < -0.3, dx > 0.3, interact, False)
+        target_y = world.big_pizza_entrance.centery - PLAYER_SIZE[1] // 2
+        return game.Input(state.player_y > target_y + 4, state.player_y < target_y - 4, False, True, interact, False)
+    return next_input
+
+
+def script_policy(path, flip=0.01):
+    # Loops the recording; each step flips a random key with probability flip
+    frames = [frame.keys for frame in inputs.Replayer(path).frames]
+    position = [0]
+
+    def next_input(rng, state, world):
+        keys = list(frames[position[0] % len(frames)])
+        position[0] += 1
+        if rng.random() < flip:
+            index = rng.randrange(5)
+            keys[index] = not keys[index]
+        return game.Input(*keys)
+    return next_input
+
+
+def make_policy(name, script=None):
+    if name == "random":
+        return random_policy()
+    if name == "seek":
+        return seek_policy()
+    return script_policy(script)
+
+
+# --- Worker ---
+_world = None
+
+
+def _load_world():
+    global _world
+    if _world is None:
+        _world = game.load_world()
+    return _world
+
+
+def _blockers(world, state):
+    # Names of the collision objects the player is against
+    level = world.house_level if state.inside_house else world.street_level
+    rect = pygame.Rect(state.player_x, state.player_y, *PLAYER_SIZE).inflate(2 * game.PLAYER_SPEED, 2 * game.PLAYER_SPEED)
+    return sorted(obj.name for obj in level.objects if obj.group == "collision" and rect.colliderect(obj.rect))
+
+
+def _trapped(state, world):
+    # True when no move gets the player anywhere
+    position = (state.player_x, state.player_y)
+    for move in MOVES:
+        moved = game.step(state, move, world)
+        if (moved.player_x, moved.player_y) != position or moved.inside_house != state.inside_house:
+            return False
+    return True
+
+
+def run_chunk(job):
+    seed, chunk, steps, policy_name, script = job
+    world = _load_world()
+    rng = random.Random(seed * 1_000_003 + chunk)
+    policy = make_policy(policy_name, script)
+    histogram = [0] * BUCKETS
+    events = Counter()
+    problems = Counter()
+    examples = {}
+    episodes = 1
+    slowest = 0
+
+    def example(kind, state, step, **extra):
+        problems[kind] += 1
+        kept = examples.setdefault(kind, [])
+        if len(kept) < MAX_EXAMPLES:
+            kept.append({"kind": kind, "seed": seed, "chunk": chunk, "step": step,
+                             "scene": "house" if state.inside_house else "street",
+                             "player": [round(state.player_x, 1), round(state.player_y, 1)],
+                             "camera_x": round(state.camera_x, 1), **extra})
+
+    state = game.GameState()
+    episode_step = 0
+    still = 0
+    began = time.perf_counter()
+    for step in range(steps):
+        inp = policy(rng, state, world)
+        prev = state
+        t0 = time.perf_counter_ns()
+        state = game.step(prev, inp, world)
+        elapsed = time.perf_counter_ns() - t0
+        histogram[min(BUCKETS - 1, max(0, elapsed.bit_length() - 10))] += 1
+        slowest = max(slowest, elapsed)
+        if elapsed > SLOW_STEP_NS:
+            example("slow_step", prev, step, ms=round(elapsed / 1e6, 3))
+        episode_step += 1
+
+        if state.events:
+            events.update(state.events)
+            still = 0
+        elif ((inp.up or inp.down or (prev.inside_house and (inp.left or inp.right)))
+              and (state.player_x, state.player_y) == (prev.player_x, prev.player_y)):
+            still += 1
+            if still == 1:
+                player_rect = pygame.Rect(state.player_x, state.player_y, *PLAYER_SIZE)
+                grid = world.house_grid if state.inside_house else world.street_grid
+                if grid.first_overlap(player_rect) is not None:
+                    example("inside", state, step, blockers=_blockers(world, state))
+                    episode_step = EPISODE_STEPS
+            elif still >= PIN_STEPS:
+                still = 0
+                if _trapped(state, world):
+                    example("trapped", state, step, blockers=_blockers(world, state))
+                    episode_step = EPISODE_STEPS
+        else:
+            still = 0
+
+        # The game ends at the Big Pizza (the jumpscare); start a new one
+        if "enter_big_pizza" in state.events or episode_step >= EPISODE_STEPS:
+            state = game.GameState()
+            episode_step = 0
+            still = 0
+            episodes += 1
+
+    return {"steps": steps, "episodes": episodes, "seconds": time.perf_counter() - began,
+            "events": dict(events), "problems": dict(problems), "examples": examples,
+            "histogram": histogram, "slowest_ns": slowest}
+
+
+def default_workers():
+    # The cores this process may actually run on (taskset, cgroup cpusets),
+    # not every core on the machine
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count()
+
+
+# --- Merging ---
+def merge(total, result):
+    total["steps"] += result["steps"]
+    total["episodes"] += result["episodes"]
+    total["cpu_seconds"] += result["seconds"]
+    total["events"].update(result["events"])
+    total["problems"].update(result["problems"])
+    for kind, entries in result["examples"].items():
+        kept = total["examples"].setdefault(kind, [])
+        kept.extend(entries[:MAX_EXAMPLES - len(kept)])
+    total["histogram"] = [a + b for a, b in zip(total["histogram"], result["histogram"])]
+    total["slowest_ns"] = max(total["slowest_ns"], result["slowest_ns"])
+
+
+def percentile_ns(histogram, fraction):
+    # Upper edge of the bucket the fraction-th step falls in
+    target = fraction * sum(histogram)
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if count and seen >= target:
+            return 2 ** (bucket + 10)
+    return 0
+
+
+def summarize(total):
+    histogram = total["histogram"]
+    return {
+        "steps": total["steps"],
+        "episodes": total["episodes"],
+        "steps_per_second": round(total["steps"] / total["wall_seconds"]) if total["wall_seconds"] else None,
+        "transitions": dict(total["events"]),
+        "problems": dict(total["problems"]),
+        "step_us": {"p50": percentile_ns(histogram, 0.5) / 1000, "p99": percentile_ns(histogram, 0.99) / 1000,
+                    "p999": percentile_ns(histogram, 0.999) / 1000, "max": round(total["slowest_ns"] / 1000, 1)},
+        "histogram": {"<%dus" % (2 ** (bucket + 10) // 1000): count for bucket, count in enumerate(histogram) if count},
+        "examples": [entry for kind in KINDS for entry in total["examples"].get(kind, [])],
+    }
+
+
+def soak(steps, workers, policy="random", script=None, seed=0, chunk_steps=CHUNK_STEPS, chunks=None, progress=True):
+    jobs = []
+    for chunk in (range(-(-steps // chunk_steps)) if chunks is None else chunks):
+        jobs.append((seed, chunk, min(chunk_steps, steps - chunk * chunk_steps) if chunks is None else chunk_steps,
+                     policy, script))
+    total = {"steps": 0, "episodes": 0, "cpu_seconds": 0.0, "events": Counter(), "problems": Counter(),
+             "examples": {}, "histogram": [0] * BUCKETS, "slowest_ns": 0}
+    began = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_load_world) as pool:
+        for done, result in enumerate(pool.imap_unordered(run_chunk, jobs), 1):
+            merge(total, result)
+            if progress:
+                print("\r%d/%d chunks, %d steps, problems: %s" % (done, len(jobs), total["steps"],
+                                                                  dict(total["problems"]) or "none"),
+                      end="", file=sys.stderr, flush=True)
+    if progress:
+        print(file=sys.stderr)
+    total["wall_seconds"] = time.perf_counter() - began
+    return summarize(total)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak/fuzz the simulation across CPU cores")
+    parser.add_argument("--steps", type=int, default=1_000_000, help="total simulation steps")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="worker processes")
+    parser.add_argument("--policy", choices=("random", "seek", "script"), default="random")
+    parser.add_argument("--script", metavar="PATH", help="input recording for --policy script (see inputs.py)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, action="append",
+                        help="only run this chunk (repeatable), e.g. to reproduce an example")
+    parser.add_argument("--output", metavar="PATH", help="write the merged results as JSON")
+    args = parser.parse_args()
+    if args.policy == "script" and not args.script:
+        parser.error("--policy script needs --script PATH")
+
+    summary = soak(args.steps, args.workers, args.policy, args.script, args.seed, chunks=args.chunk)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=1)
+    print(json.dumps({key: value for key, value in summary.items() if key != "examples"}, indent=1))
+    for entry in summary["examples"]:
+        print(entry)
+    sys.exit(1 if summary["problems"].get("trapped") or summary["problems"].get("inside") else 0)
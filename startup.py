@@ -0,0 +1,183 @@
+import heapq
+import importlib
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# --- Startup ---
+# Helpers for getting the first frame on screen sooner: lazy module imports,
+# a prioritized background loader for assets the first scene does not need,
+# and per-phase timings.
+
+
+class LazyModule:
+    # Stands in for a module and imports it on first attribute access
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                module = self._module
+                if module is None:
+                    module = importlib.import_module(self._name)
+                    self.__dict__["_module"] = module
+        return module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return "<lazy module %r (%s)>" % (self._name, state)
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+class StartupTimer:
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def record(self, name, began, ended):
+        with self._lock:
+            self.phases.append((name, (began - self.start) * 1000, (ended - began) * 1000))
+
+    def _mark(self, name, at):
+        with self._lock:
+            self.phases.append((name, (at - self.start) * 1000, None))
+
+    @contextmanager
+    def phase(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, began, time.perf_counter())
+
+    def mark(self, name):
+        # A point in time rather than a phase, e.g. "first_frame"
+        self._mark(name, time.perf_counter())
+
+    def report(self):
+        with self._lock:
+            return [{"phase": name, "at_ms": round(at, 2), "ms": None if ms is None else round(ms, 2)}
+                    for name, at, ms in self.phases]
+
+    def summary(self):
+        parts = []
+        for entry in self.report():
+            if entry["ms"] is not None:
+                parts.append("%s %.0fms" % (entry["phase"], entry["ms"]))
+            else:
+                parts.append("%s @%.0fms" % (entry["phase"], entry["at_ms"]))
+        return "startup: " + ", ".join(parts)
+
+
+class Loader:
+    # Runs named load jobs on a few worker threads, lowest priority number
+    # first. get() returns a finished result straight away; if the job has
+    # not started yet it runs it on the calling thread instead of waiting
+    # behind the rest of the queue. discard() forgets a job so the same name
+    # can be submitted (and loaded) again later.
+    def __init__(self, workers=2, timer=None):
+        self.timer = timer
+        self._tasks = {}
+        self._heap = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._work, name="loader-%d" % i, daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, name, fn, priority=10):
+        with self._cond:
+            task = self._tasks.get(name)
+            if task is not None:
+                return task["future"]
+            task = {"fn": fn, "future": Future(), "claimed": False}
+            self._tasks[name] = task
+            heapq.heappush(self._heap, (priority, self._seq, name))
+            self._seq += 1
+            self._cond.notify()
+            return task["future"]
+
+    def _claim(self, name):
+        # Caller holds the lock. None if the job is running, done or discarded.
+        task = self._tasks.get(name)
+        if task is None or task["claimed"]:
+            return None
+        task["claimed"] = True
+        return task
+
+    def _run(self, name, task):
+        began = time.perf_counter()
+        try:
+            result = task["fn"]()
+        except BaseException as exc:
+            task["future"].set_exception(exc)
+        else:
+            task["future"].set_result(result)
+        if self.timer is not None:
+            self.timer.record("load:" + name, began, time.perf_counter())
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                _priority, _seq, name = heapq.heappop(self._heap)
+                task = self._claim(name)
+            if task is not None:
+                self._run(name, task)
+            # Don't hold on to the last result while waiting for the next job
+            task = None
+
+    def ready(self, name):
+        task = self._tasks.get(name)
+        return task is not None and task["future"].done()
+
+    def get(self, name, timeout=None):
+        with self._cond:
+            task = self._claim(name)
+        if task is not None:
+            self._run(name, task)
+        return self._tasks[name]["future"].result(timeout)
+
+    def wait(self, names):
+        return [self.get(name) for name in names]
+
+    def discard(self, name):
+        # Returns the job's future (None if there was no such job). A job
+        # that hasn't started never runs; one that is running still finishes
+        # and settles the returned future.
+        with self._cond:
+            task = self._tasks.pop(name, None)
+            if task is None:
+                return None
+            if not task["claimed"]:
+                task["claimed"] = True
+                task["future"].cancel()
+            return task["future"]
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
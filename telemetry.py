@@ -0,0 +1,284 @@
+import gzip
+import http.client
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+# --- Telemetry ---
+# emit() only puts the event on a bounded queue, and when the queue is full
+# the event is dropped, so the game loop never waits on telemetry. A
+# background thread batches events, gzips each batch as JSON
+# {"session": ..., "batch": n, "events": [...]} and POSTs it to the ingest
+# endpoint (telemetry_server.py) over kept-alive connections. Batches that
+# can't be delivered are spooled to SPOOL_DIR and sent, oldest first, once
+# the endpoint answers again, as is anything still queued when close() gives
+# up waiting, including the batch the thread is stuck sending. A batch whose
+# response was lost may be sent twice; the server drops repeats of a
+# (session, batch) it has already stored.
+SPOOL_DIR = os.path.join(".cache", "telemetry", "spool")
+MAX_QUEUE = 2048
+BATCH_SIZE = 200
+FLUSH_SECONDS = 2.0
+MAX_SPOOL_FILES = 500
+TIMEOUT = 2.0
+
+
+class ConnectionPool:
+    # Idle HTTP connections to one host, reused across requests
+    def __init__(self, url, size=2, timeout=TIMEOUT):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or "/"
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def post(self, body, headers):
+        # Returns the response status; raises OSError / HTTPException when
+        # the endpoint can't be reached
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        fresh = conn is None
+        if fresh:
+            conn = self._connect()
+        try:
+            conn.request("POST", self.path, body, headers)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            if fresh:
+                raise
+            # A kept-alive connection the server already closed; nothing
+            # reached it, so retry once
+            return self.post(body, headers)
+        try:
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # The server may have the batch already: no retry here
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+        return response.status
+
+    def close(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+
+
+class Telemetry:
+    def __init__(self, endpoint, spool_dir=SPOOL_DIR, max_queue=MAX_QUEUE, batch_size=BATCH_SIZE,
+                 flush_seconds=FLUSH_SECONDS, session=None):
+        self.endpoint = endpoint
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.session = session or uuid.uuid4().hex
+        self.stats = {"queued": 0, "dropped": 0, "sent": 0, "batches": 0, "spooled": 0, "failures": 0}
+
+        self._queue = queue.Queue(max_queue)
+        self._pool = ConnectionPool(endpoint)
+        self._started = time.monotonic()
+        self._ids = itertools.count(1)  # batch and spool file numbers
+        self._closing = threading.Event()
+        # Held for spool file operations (close() may spool while the thread
+        # still is) and for handing back the batch being sent
+        self._spool_lock = threading.Lock()
+        self._inflight = None
+        self._thread = threading.Thread(target=self._work, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def emit(self, kind, **fields):
+        # Never blocks; returns False if the event had to be dropped
+        event = {"kind": kind, "t_ms": round((time.monotonic() - self._started) * 1000), **fields}
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    # --- Background thread ---
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if self._closing.is_set():
+                timeout = 0
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _encode(self, batch):
+        payload = {"session": self.session, "batch": next(self._ids), "events": batch}
+        return gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), 6)
+
+    def _send(self, body):
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        try:
+            status = self._pool.post(body, headers)
+        except (OSError, http.client.HTTPException):
+            status = None
+        if status is not None and 200 <= status < 300:
+            return True
+        self.stats["failures"] += 1
+        return False
+
+    def _spool(self, body):
+        with self._spool_lock:
+            self._write_spool(body)
+
+    def _write_spool(self, body):
+        # Call with _spool_lock held
+        os.makedirs(self.spool_dir, exist_ok=True)
+        names = self._spooled()
+        if len(names) >= MAX_SPOOL_FILES:
+            # Oldest batches go first when the spool is full
+            os.remove(os.path.join(self.spool_dir, names[0]))
+        name = "%d-%s-%06d.json.gz" % (time.time_ns(), self.session[:8], next(self._ids))
+        tmp = os.path.join(self.spool_dir, name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, os.path.join(self.spool_dir, name))
+        self.stats["spooled"] += 1
+
+    def _spooled(self):
+        # Spool file names, oldest first (they start with a timestamp)
+        try:
+            return sorted(name for name in os.listdir(self.spool_dir) if name.endswith(".json.gz"))
+        except FileNotFoundError:
+            return []
+
+    def _drain_spool(self):
+        # Sends spooled batches oldest first; stops at the first failure
+        for name in self._spooled():
+            path = os.path.join(self.spool_dir, name)
+            with self._spool_lock:
+                try:
+                    with open(path, "rb") as f:
+                        body = f.read()
+                except FileNotFoundError:
+                    continue  # pruned since the listing
+            if not self._send(body):
+                return False
+            with self._spool_lock:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return True
+
+    def _work(self):
+        spool_pending = True
+        while True:
+            batch = self._next_batch()
+            if batch:
+                body = self._encode(batch)
+                self._inflight = body
+                # Keep the order: spooled batches go before new ones
+                sent = (not spool_pending or self._drain_spool()) and self._send(body)
+                with self._spool_lock:
+                    # None if close() gave up on us and spooled it already
+                    handed_back = self._inflight is None
+                    self._inflight = None
+                    if sent:
+                        spool_pending = False
+                        self.stats["sent"] += len(batch)
+                        self.stats["batches"] += 1
+                    elif not handed_back:
+                        self._write_spool(body)
+                        spool_pending = True
+            elif spool_pending and not self._closing.is_set():
+                spool_pending = not self._drain_spool()
+            if self._closing.is_set() and self._queue.empty():
+                break
+
+    def close(self, timeout=TIMEOUT):
+        # Sends (or spools) whatever is queued, then stops the thread. If the
+        # endpoint hangs past timeout, the batch being sent and the rest of
+        # the queue are spooled here: the thread is a daemon and dies with
+        # the process.
+        self._closing.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            with self._spool_lock:
+                if self._inflight is not None:
+                    self._write_spool(self._inflight)
+                    self._inflight = None
+                batch = []
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                    if len(batch) == self.batch_size:
+                        self._write_spool(self._encode(batch))
+                        batch = []
+                if batch:
+                    self._write_spool(self._encode(batch))
+        self._pool.close()
+
+
+class FrameSummary:
+    # Rolls frame times up into one summary event per window_ms of play
+    def __init__(self, window_ms=5000):
+        self.window_ms = window_ms
+        self.frames = []
+        self.elapsed = 0
+
+    def add(self, frame_ms):
+        # Returns the summary fields when a window is complete, else None
+        self.frames.append(frame_ms)
+        self.elapsed += frame_ms
+        if self.elapsed < self.window_ms:
+            return None
+        frames = sorted(self.frames)
+        summary = {
+            "frames": len(frames),
+            "avg_ms": round(self.elapsed / len(frames), 2),
+            "p95_ms": frames[min(len(frames) - 1, int(len(frames) * 0.95))],
+            "max_ms": frames[-1],
+        }
+        self.frames = []
+        self.elapsed = 0
+        return summary
+
+
+class NullTelemetry:
+    # Stands in when telemetry is off
+    session = None
+    stats = {}
+
+    def emit(self, kind, **fields):
+        return False
+
+    def close(self, timeout=None):
+        pass
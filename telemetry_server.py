@@ -0,0 +1,84 @@
+import argparse
+import gzip
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from flask import Flask, jsonify, request
+
+# --- Telemetry ingest ---
+# A small Flask app the kiosks post their batches to (see telemetry.py).
+# Batches arrive as gzipped JSON {"session": ..., "batch": n, "events": [...]}
+# and are appended, one event per line, to a JSON-lines file. A client may
+# send a batch again when it never saw the answer, so the last SEEN_BATCHES
+# (session, batch) pairs are remembered and repeats are acknowledged but
+# not stored.
+#
+#     python telemetry_server.py --port 8765
+#     python main.py --telemetry http://127.0.0.1:8765/ingest
+DEFAULT_STORE = os.path.join(".cache", "telemetry", "events.jsonl")
+SEEN_BATCHES = 100_000
+
+
+def create_app(store_path=DEFAULT_STORE):
+    app = Flask(__name__)
+    lock = threading.Lock()
+    summary = {"batches": 0, "events": 0, "duplicates": 0, "kinds": Counter(), "sessions": set()}
+    seen = OrderedDict()
+    os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+
+    @app.post("/ingest")
+    def ingest():
+        body = request.get_data()
+        if request.headers.get("Content-Encoding") == "gzip":
+            try:
+                body = gzip.decompress(body)
+            except OSError:
+                return jsonify(error="bad gzip body"), 400
+        try:
+            payload = json.loads(body)
+            session = str(payload["session"])
+            batch = payload.get("batch")
+            events = list(payload["events"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return jsonify(error="expected {session, events}"), 400
+
+        lines = [json.dumps({"session": session, **event}) + "\n" for event in events]
+        with lock:
+            if batch is not None:
+                key = (session, str(batch))
+                if key in seen:
+                    summary["duplicates"] += 1
+                    return jsonify(accepted=0, duplicate=True)
+                seen[key] = True
+                if len(seen) > SEEN_BATCHES:
+                    seen.popitem(last=False)
+            with open(store_path, "a") as f:
+                f.writelines(lines)
+            summary["batches"] += 1
+            summary["events"] += len(events)
+            summary["kinds"].update(event.get("kind") for event in events)
+            summary["sessions"].add(session)
+        return jsonify(accepted=len(events))
+
+    @app.get("/stats")
+    def stats():
+        with lock:
+            return jsonify(batches=summary["batches"], events=summary["events"], duplicates=summary["duplicates"],
+                           sessions=len(summary["sessions"]), kinds=dict(summary["kinds"]))
+
+    @app.get("/health")
+    def health():
+        return jsonify(ok=True)
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telemetry ingest server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--store", default=DEFAULT_STORE, help="JSON-lines file events are appended to")
+    args = parser.parse_args()
+    create_app(args.store).run(args.host, args.port, threaded=True)
@@ -0,0 +1,148 @@
+import gzip
+import json
+import os
+import socket
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+import telemetry
+from telemetry_server import create_app
+
+
+# --- Helpers ---
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    # telemetry_server's app on a real socket, so the client's own HTTP
+    # connections are what get tested
+    def __init__(self, store_path, port=0):
+        self.app = create_app(str(store_path))
+        self.http = make_server("127.0.0.1", port, self.app, threaded=True)
+        self.url = "http://127.0.0.1:%d/ingest" % self.http.server_port
+        self.thread = threading.Thread(target=self.http.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stats(self):
+        return self.app.test_client().get("/stats").get_json()
+
+    def close(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+
+def spooled_events(spool_dir):
+    # Events in the spool, in the order they'd be sent
+    events = []
+    for name in sorted(os.listdir(spool_dir)):
+        with open(os.path.join(spool_dir, name), "rb") as f:
+            events.extend(json.loads(gzip.decompress(f.read()))["events"])
+    return events
+
+
+def emit_all(client, numbers):
+    for i in numbers:
+        assert client.emit("step", i=i)
+
+
+@pytest.fixture(autouse=True)
+def _join_telemetry_threads():
+    # A test that leaves a thread stuck on a dead endpoint waits for it here
+    before = set(threading.enumerate())
+    yield
+    for thread in set(threading.enumerate()) - before:
+        if thread.name == "telemetry":
+            thread.join(telemetry.TIMEOUT + 2)
+
+
+# --- Tests ---
+def test_delivers_in_batches(tmp_path):
+    server = Server(tmp_path / "events.jsonl")
+    try:
+        client = telemetry.Telemetry(server.url, spool_dir=str(tmp_path / "spool"), flush_seconds=0.05)
+        emit_all(client, range(450))
+        client.close()
+        assert client.stats["sent"] == 450
+        assert client.stats["batches"] == 3
+        assert server.stats()["events"] == 450
+        with open(tmp_path / "events.jsonl") as f:
+            assert [json.loads(line)["i"] for line in f] == list(range(450))
+    finally:
+        server.close()
+
+
+def test_repeated_batch_is_stored_once(tmp_path):
+    app = create_app(str(tmp_path / "events.jsonl"))
+    http = app.test_client()
+    body = gzip.compress(json.dumps({"session": "s", "batch": 1, "events": [{"kind": "a"}]}).encode())
+    headers = {"Content-Encoding": "gzip"}
+    assert http.post("/ingest", data=body, headers=headers).get_json() == {"accepted": 1}
+    assert http.post("/ingest", data=body, headers=headers).get_json() == {"accepted": 0, "duplicate": True}
+    stats = http.get("/stats").get_json()
+    assert (stats["events"], stats["batches"], stats["duplicates"]) == (1, 1, 1)
+
+
+def test_spools_while_down_and_drains_in_order(tmp_path):
+    spool_dir = str(tmp_path / "spool")
+    port = free_port()
+    url = "http://127.0.0.1:%d/ingest" % port
+
+    client = telemetry.Telemetry(url, spool_dir=spool_dir, flush_seconds=0.05, batch_size=100)
+    emit_all(client, range(250))
+    client.close()
+    assert client.stats["sent"] == 0
+    assert [event["i"] for event in spooled_events(spool_dir)] == list(range(250))
+
+    server = Server(tmp_path / "events.jsonl", port)
+    try:
+        client = telemetry.Telemetry(url, spool_dir=spool_dir, flush_seconds=0.05)
+        assert client.emit("after")
+        client.close()
+        assert os.listdir(spool_dir) == []
+        with open(tmp_path / "events.jsonl") as f:
+            stored = [json.loads(line) for line in f]
+        assert [event["i"] for event in stored[:250]] == list(range(250))
+        assert stored[250]["kind"] == "after"
+    finally:
+        server.close()
+
+
+def test_close_spools_the_stuck_batch_and_the_queue(tmp_path):
+    # An endpoint that accepts connections and never answers
+    spool_dir = str(tmp_path / "spool")
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    url = "http://127.0.0.1:%d/ingest" % listener.getsockname()[1]
+    try:
+        client = telemetry.Telemetry(url, spool_dir=spool_dir, flush_seconds=0.05, batch_size=100)
+        emit_all(client, range(50))
+        # Wait for the thread to take the first batch and hang sending it
+        while client._inflight is None:
+            threading.Event().wait(0.01)
+        emit_all(client, range(50, 300))
+        client.close(timeout=0.2)
+        assert client._thread.is_alive()
+        assert sorted(event["i"] for event in spooled_events(spool_dir)) == list(range(300))
+
+        # Once its send times out the thread must not spool the batch again
+        client._thread.join(telemetry.TIMEOUT + 2)
+        assert not client._thread.is_alive()
+        assert len(spooled_events(spool_dir)) == 300
+    finally:
+        listener.close()
+
+
+def test_emit_never_blocks_when_full(tmp_path):
+    client = telemetry.Telemetry("http://127.0.0.1:%d/ingest" % free_port(), spool_dir=str(tmp_path / "spool"),
+                                 max_queue=10, flush_seconds=60)
+    try:
+        results = [client.emit("step", i=i) for i in range(50)]
+        assert results.count(False) == client.stats["dropped"] > 0
+    finally:
+        client.close(timeout=0.5)
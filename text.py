@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+
+import pygame
+
+import memory
+
+# --- Text cache ---
+# One loaded Font per (name, size), plus an LRU of rendered surfaces keyed by
+# (font, text, color, antialias). Fonts are never evicted, so a Font object is
+# a stable key for as long as the game runs. The lock lets background chunk
+# rendering share the cache with the main loop.
+MAX_RENDERED = 256
+
+_fonts = {}
+_rendered = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.RLock()
+
+
+def get_font(name=None, size=24):
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        with _lock:
+            font = _fonts.get(key)
+            if font is None:
+                font = pygame.font.SysFont(name, size)
+                _fonts[key] = font
+    return font
+
+
+def render(font, text, color, antialias=True):
+    key = (font, text, tuple(color), antialias)
+    with _lock:
+        surface = _rendered.get(key)
+        if surface is not None:
+            _rendered.move_to_end(key)
+            _stats["hits"] += 1
+            return surface
+
+        _stats["misses"] += 1
+        surface = memory.track("text", font.render(text, antialias, color))
+        _rendered[key] = surface
+        if len(_rendered) > MAX_RENDERED:
+            _rendered.popitem(last=False)
+            _stats["evictions"] += 1
+        return surface
+
+
+def render_sys(text, size, color, name=None, antialias=True):
+    # Shortcut for the old pygame.font.SysFont(name, size).render(...) pattern
+    return render(get_font(name, size), text, color, antialias)
+
+
+def cache_info():
+    return {
+        "fonts": len(_fonts),
+        "rendered": len(_rendered),
+        "max_rendered": MAX_RENDERED,
+        **_stats,
+    }
+
+
+def clear():
+    with _lock:
+        _rendered.clear()
+        for key in _stats:
+            _stats[key] = 0
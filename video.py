@@ -0,0 +1,392 @@
+import mmap
+import os
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import pygame
+
+import memory
+import profiler
+import startup
+
+moviepy = startup.lazy_import("moviepy")
+
+# --- Video playback ---
+# A decoder thread pulls frames from a source, converts and scales them into a
+# small ring of preallocated screen-sized surfaces, and hands them to the main
+# thread. Presentation is timed against the wall clock from the first frame:
+# a frame more than a frame late is dropped when a newer one is already
+# waiting. If the decoder itself can't keep up, late frames are shown anyway
+# and the clock restarts from them, so a slow machine plays slower rather
+# than freezing on one image.
+BUFFER_FRAMES = 6
+
+# --- Raw frame cache ---
+# Bundled videos can be transcoded ahead of time into raw RGB frames at the
+# window size. Playback then maps the file and blits straight out of it with
+# no ffmpeg and no rescale. Layout: RAW_HEADER padded to RAW_DATA_OFFSET, then
+# frame_count * width * height * 3 bytes. A cache is rebuilt whenever the
+# source file or the target size changes.
+#
+# Playback pages the whole file through memory, so caches are capped at
+# MAX_RAW_BYTES: about 24 s at 800x600 and 30 fps. Longer clips are stored
+# at a fraction of the target size (RAW_SCALES, per axis) and scaled up as
+# they're shown, which costs well under a millisecond a frame: the jumpscare
+# (70 s, about 2.8 GB at 800x600) fits in about 720 MB at 400x300.
+#
+# The game starts a build in a background process on first run (see
+# build_raw_cache_in_background); until it's done, videos are decoded live.
+CACHE_DIR = os.path.join(".cache", "video")
+RAW_MAGIC = b"RAWV"
+RAW_VERSION = 1
+RAW_HEADER = struct.Struct("<4sHHIIdIqq")
+RAW_DATA_OFFSET = 64
+MAX_RAW_BYTES = 1024 ** 3
+RAW_SCALES = (1, 2)
+STALE_BUILD_S = 60  # a temp file untouched this long was left by a build that died
+
+
+class ClipSource:
+    # Decodes a video file with moviepy. Frames are (height, width, 3) uint8.
+    def __init__(self, path):
+        self.clip = moviepy.VideoFileClip(path)
+        self.fps = self.clip.fps
+        self.size = tuple(self.clip.size)
+        self.frame_count = int(self.clip.duration * self.fps)
+
+    def frames(self):
+        return self.clip.iter_frames(fps=self.fps, dtype="uint8")
+
+    def close(self):
+        self.clip.close()
+
+
+class RawFrameSource:
+    # Frames from a raw cache file, returned as surfaces over the mapped bytes
+    def __init__(self, cache_file):
+        self._file = open(cache_file, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _read_raw_header(self._map)
+        if header is None:
+            self.close()
+            raise ValueError("%s is not a raw frame cache" % cache_file)
+        width, height, self.fps, self.frame_count = header[:4]
+        self.size = (width, height)
+        self.frame_bytes = width * height * 3
+        self._view = memoryview(self._map)
+
+    def frame_at(self, index):
+        start = RAW_DATA_OFFSET + index * self.frame_bytes
+        return pygame.image.frombuffer(self._view[start:start + self.frame_bytes], self.size, "RGB")
+
+    def frames(self):
+        for index in range(self.frame_count):
+            yield self.frame_at(index)
+
+    def close(self):
+        if self._map is None:
+            return
+        try:
+            if getattr(self, "_view", None) is not None:
+                self._view.release()
+            self._map.close()
+        except BufferError:
+            # A frame surface is still alive; the map goes when it does
+            pass
+        self._file.close()
+        self._map = None
+
+
+def _read_raw_header(buf):
+    if len(buf) < RAW_DATA_OFFSET:
+        return None
+    magic, version, _reserved, width, height, fps, count, mtime_ns, size = RAW_HEADER.unpack_from(buf)
+    if magic != RAW_MAGIC or version != RAW_VERSION:
+        return None
+    if len(buf) < RAW_DATA_OFFSET + width * height * 3 * count:
+        return None
+    return width, height, fps, count, mtime_ns, size
+
+
+def raw_cache_path(path, size, cache_dir=CACHE_DIR):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, "%s_%dx%d.rgb" % (name, size[0], size[1]))
+
+
+def raw_sizes(size):
+    # Frame sizes a cache for the target size may be stored at, largest first
+    return [(size[0] // scale, size[1] // scale) for scale in RAW_SCALES]
+
+
+def raw_cache_fresh(path, size, cache_dir=CACHE_DIR):
+    cache_file = raw_cache_path(path, size, cache_dir)
+    try:
+        stat = os.stat(path)
+        with open(cache_file, "rb") as f:
+            header = f.read(RAW_DATA_OFFSET)
+            f.seek(0, os.SEEK_END)
+            length = f.tell()
+    except OSError:
+        return False
+    if len(header) < RAW_DATA_OFFSET:
+        return False
+    magic, version, _reserved, width, height, _fps, count, mtime_ns, src_size = RAW_HEADER.unpack(header[:RAW_HEADER.size])
+    return (magic == RAW_MAGIC and version == RAW_VERSION
+            and (width, height) in raw_sizes(size)
+            and mtime_ns == stat.st_mtime_ns and src_size == stat.st_size
+            and length >= RAW_DATA_OFFSET + width * height * 3 * count)
+
+
+def _claim_build(tmp_file):
+    # Only one build at a time writes a cache's temp file. Returns it open
+    # for writing, or None while another build is still going.
+    try:
+        return open(tmp_file, "xb")
+    except FileExistsError:
+        pass
+    try:
+        if time.time() - os.path.getmtime(tmp_file) < STALE_BUILD_S:
+            return None
+        os.remove(tmp_file)
+        return open(tmp_file, "xb")
+    except OSError:
+        return None
+
+
+def build_raw_cache(path, size, cache_dir=CACHE_DIR, max_bytes=MAX_RAW_BYTES):
+    # Transcodes path into a raw cache for size, at the largest of
+    # raw_sizes(size) that fits in max_bytes. Returns the cache file, or
+    # None if none fits or another build is already writing it.
+    cache_file = raw_cache_path(path, size, cache_dir)
+    if raw_cache_fresh(path, size, cache_dir):
+        return cache_file
+
+    source = ClipSource(path)
+    fitting = [stored for stored in raw_sizes(size)
+               if source.frame_count * stored[0] * stored[1] * 3 <= max_bytes]
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = cache_file + ".tmp"
+    f = _claim_build(tmp_file) if fitting else None
+    if f is None:
+        source.close()
+        return None
+
+    stat = os.stat(path)
+    width, height = fitting[0]
+    scaled = pygame.Surface((width, height))
+    decoded = pygame.Surface(source.size)
+    count = 0
+    try:
+        with f:
+            f.write(b"\0" * RAW_DATA_OFFSET)
+            for frame in source.frames():
+                pygame.surfarray.blit_array(decoded, frame.swapaxes(0, 1))
+                pygame.transform.scale(decoded, (width, height), scaled)
+                f.write(pygame.image.tobytes(scaled, "RGB"))
+                count += 1
+            # Header goes in last so a half-written file never looks valid
+            f.seek(0)
+            f.write(RAW_HEADER.pack(RAW_MAGIC, RAW_VERSION, 0, width, height, source.fps,
+                                    count, stat.st_mtime_ns, stat.st_size))
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+    finally:
+        source.close()
+    os.replace(tmp_file, cache_file)
+    return cache_file
+
+
+def build_raw_cache_in_background(path, size, cache_dir=CACHE_DIR):
+    # Runs this file's build step in a low-priority child process, so the
+    # transcode neither holds the game's GIL nor dies with it. Returns the
+    # process, or None if the cache is already up to date.
+    if raw_cache_fresh(path, size, cache_dir):
+        return None
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), path, "%dx%d" % tuple(size), cache_dir],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        preexec_fn=(lambda: os.nice(10)) if hasattr(os, "nice") else None)
+
+
+def open_source(path, size, cache_dir=CACHE_DIR):
+    # The raw cache when it is up to date, otherwise decode the file directly
+    if raw_cache_fresh(path, size, cache_dir):
+        return RawFrameSource(raw_cache_path(path, size, cache_dir))
+    return ClipSource(path)
+
+
+class VideoPlayer:
+    def __init__(self, source, size, buffer_frames=BUFFER_FRAMES):
+        self.source = source
+        self.size = tuple(size)
+        self.fps = source.fps
+        self.stats = {"shown": 0, "dropped": 0, "max_late_ms": 0.0}
+
+        self.buffer_frames = buffer_frames
+        self._free = queue.Queue()
+        self._ready = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Decoder thread ---
+    def _fill(self, slot, frame):
+        # Sources can hand back ready-made surfaces at the target size;
+        # anything else is a numpy frame to convert and scale.
+        if isinstance(frame, pygame.Surface):
+            slot.blit(frame, (0, 0))
+        elif self.source.size == self.size:
+            pygame.surfarray.blit_array(slot, frame.swapaxes(0, 1))
+        else:
+            pygame.surfarray.blit_array(self._decode_surface, frame.swapaxes(0, 1))
+            pygame.transform.scale(self._decode_surface, self.size, slot)
+
+    def _decode(self):
+        try:
+            for index, frame in enumerate(self.source.frames()):
+                slot = None
+                while slot is None:
+                    if self._stop.is_set():
+                        return
+                    try:
+                        slot = self._free.get(timeout=0.05)
+                    except queue.Empty:
+                        pass
+                with profiler.section("video_decode"):
+                    self._fill(slot, frame)
+                self._ready.put((index, slot))
+        finally:
+            self._ready.put(None)
+
+    def start(self):
+        if self._thread is None:
+            # Everything the decoder writes into is allocated up front. Slots
+            # cycle between the free queue and the ready queue.
+            self._decode_surface = memory.track("video", pygame.Surface(self.source.size))
+            for _ in range(self.buffer_frames):
+                self._free.put(memory.track("video", pygame.Surface(self.size)))
+            self._thread = threading.Thread(target=self._decode, name="video-decode", daemon=True)
+            self._thread.start()
+
+    def _direct(self):
+        return hasattr(self.source, "frame_at")
+
+    def prepare(self):
+        # Gets playback going ahead of time (e.g. on a loader thread) so
+        # play() shows its first frame straight away: the decoder starts
+        # filling the ring, or a raw cache's first frame is paged in.
+        if self._direct():
+            self.source.frame_at(0)
+        else:
+            self.start()
+
+    # --- Presentation ---
+    def _newer_ready(self):
+        # True if a later frame (not just the end marker) is waiting
+        with self._ready.mutex:
+            return any(item is not None for item in self._ready.queue)
+
+    def play(self, screen, pos=(0, 0)):
+        # Returns False if the window was closed during playback
+        if self._direct():
+            return self._play_direct(screen, pos)
+
+        self.start()
+        frame_time = 1.0 / self.fps
+        start = None
+
+        while True:
+            item = self._ready.get()
+            if item is None:
+                return True
+            index, slot = item
+
+            now = time.perf_counter()
+            if start is None:
+                start = now - index * frame_time
+            due = start + index * frame_time
+
+            if now - due > frame_time:
+                if self._newer_ready():
+                    # The next frame is already due and decoded; skip this one
+                    self.stats["dropped"] += 1
+                    self._free.put(slot)
+                    continue
+                # The decoder is behind real time: show this frame late and
+                # time the rest from it, rather than dropping everything after
+                self.stats["max_late_ms"] = max(self.stats["max_late_ms"], (now - due) * 1000)
+                start = now - index * frame_time
+                due = now
+
+            if now < due:
+                time.sleep(due - now)
+                now = time.perf_counter()
+
+            for event in pygame.event.get(pygame.QUIT):
+                self._free.put(slot)
+                return False
+
+            with profiler.section("video_present"):
+                screen.blit(slot, pos)
+                pygame.display.update()
+            self._free.put(slot)
+            self.stats["shown"] += 1
+            self.stats["max_late_ms"] = max(self.stats["max_late_ms"], (now - due) * 1000)
+
+    def _play_direct(self, screen, pos):
+        # Random-access source: no decoder thread or ring needed, just show
+        # whichever frame the wall clock says is due, scaled up if the cache
+        # was stored smaller than the screen.
+        frame_time = 1.0 / self.fps
+        scaled = None
+        if self.source.size != self.size:
+            scaled = memory.track("video", pygame.Surface(self.size, 0, self.source.frame_at(0)))
+        start = time.perf_counter()
+        shown = -1
+        while True:
+            now = time.perf_counter()
+            index = int((now - start) / frame_time)
+            if index >= self.source.frame_count:
+                return True
+            if pygame.event.get(pygame.QUIT):
+                return False
+
+            if index != shown:
+                self.stats["dropped"] += max(0, index - shown - 1)
+                with profiler.section("video_present"):
+                    frame = self.source.frame_at(index)
+                    if scaled is not None:
+                        frame = pygame.transform.scale(frame, self.size, scaled)
+                    screen.blit(frame, pos)
+                    pygame.display.update()
+                self.stats["shown"] += 1
+                shown = index
+
+            due = start + (shown + 1) * frame_time
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.source.close()
+
+
+if __name__ == "__main__":
+    # Build step: python video.py jumpscare.mp4 [800x600 [CACHE_DIR]]. The
+    # game also runs this itself on first run.
+    if len(sys.argv) < 2:
+        sys.exit("usage: python video.py VIDEO [WIDTHxHEIGHT [CACHE_DIR]]")
+    target = tuple(int(v) for v in (sys.argv[2] if len(sys.argv) > 2 else "800x600").split("x"))
+    result = build_raw_cache(sys.argv[1], target, *sys.argv[3:4])
+    if result is None:
+        sys.exit("no raw cache for %s at %dx%d: too big even at %dx%d, or a build is already running"
+                 % ((sys.argv[1],) + target + raw_sizes(target)[-1]))
+    print(result)